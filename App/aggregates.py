@@ -0,0 +1,100 @@
+import threading
+import numpy as np
+import pandas as pd
+from data_loader import load_data_with_version, get_sql_source
+
+GASOLINA = 'Gasolina MC ($/gal)'
+ACPM = 'ACPM ($/gal)'
+
+class PriceAggregates:
+    """
+    Agregados precalculados del dataset de precios: sumas y conteos por fecha
+    y ciudad, acumulados a lo largo de las fechas ordenadas. El promedio de
+    cualquier rango de fechas (por ciudad o por año) se obtiene con dos
+    búsquedas binarias y una resta de sumas acumuladas, sin recorrer las filas.
+    """
+
+    def __init__(self, df):
+        data = df.dropna(subset=['fecha', 'Ciudad'])
+        data = data.assign(Ciudad=data['Ciudad'].astype(str))
+
+        grouped = data.groupby(['fecha', 'Ciudad'], observed=True)
+        table = pd.DataFrame({
+            'rows': grouped.size(),
+            'gas_sum': grouped[GASOLINA].sum(),
+            'gas_count': grouped[GASOLINA].count(),
+            'acpm_sum': grouped[ACPM].sum(),
+            'acpm_count': grouped[ACPM].count()
+        }).unstack('Ciudad', fill_value=0).sort_index()
+
+        self.dates = table.index.to_numpy(dtype='datetime64[ns]')
+        self.cities = table['rows'].columns.to_numpy()
+        self.years = table.index.year.to_numpy()
+
+        # Sumas acumuladas con una fila inicial de ceros: el rango [i, j) es acum[j] - acum[i]
+        self._cumulative = {
+            name: np.vstack([np.zeros((1, len(self.cities))), table[name].to_numpy(dtype=float).cumsum(axis=0)])
+            for name in ('rows', 'gas_sum', 'gas_count', 'acpm_sum', 'acpm_count')
+        }
+
+        # Posición de la primera fecha de cada año dentro de las fechas ordenadas
+        self._year_values, self._year_starts = np.unique(self.years, return_index=True)
+
+    def bounds(self, start_date, end_date):
+        # Índices [i, j) de las fechas dentro del rango cerrado [start_date, end_date]
+        start = np.datetime64(pd.Timestamp(start_date), 'ns')
+        end = np.datetime64(pd.Timestamp(end_date), 'ns')
+        return (
+            int(np.searchsorted(self.dates, start, side='left')),
+            int(np.searchsorted(self.dates, end, side='right'))
+        )
+
+    def _range_totals(self, i, j):
+        return {name: cumulative[j] - cumulative[i] for name, cumulative in self._cumulative.items()}
+
+    def city_means(self, start_date, end_date):
+        """Promedio de Gasolina MC y ACPM por ciudad en el rango (equivale a groupby('Ciudad').mean())."""
+        i, j = self.bounds(start_date, end_date)
+        totals = self._range_totals(i, j)
+        present = totals['rows'] > 0
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return pd.DataFrame({
+                'Ciudad': self.cities[present],
+                GASOLINA: (totals['gas_sum'] / totals['gas_count'])[present],
+                ACPM: (totals['acpm_sum'] / totals['acpm_count'])[present]
+            })
+
+    def year_means(self, start_date, end_date):
+        """Promedio de Gasolina MC y ACPM por año en el rango (equivale a groupby(fecha.dt.year).mean())."""
+        i, j = self.bounds(start_date, end_date)
+        records = []
+        for k, year in enumerate(self._year_values):
+            year_end = self._year_starts[k + 1] if k + 1 < len(self._year_starts) else len(self.dates)
+            a, b = max(i, self._year_starts[k]), min(j, year_end)
+            if a >= b:
+                continue
+            totals = {name: values.sum() for name, values in self._range_totals(a, b).items()}
+            with np.errstate(invalid='ignore', divide='ignore'):
+                records.append({
+                    'fecha': int(year),
+                    'Promedio_Gasolina': totals['gas_sum'] / totals['gas_count'],
+                    'Promedio_ACPM': totals['acpm_sum'] / totals['acpm_count']
+                })
+        return pd.DataFrame(records, columns=['fecha', 'Promedio_Gasolina', 'Promedio_ACPM'])
+
+# Agregados del proceso, recalculados solo cuando cambia la versión del dataset
+_aggregates = {}
+_aggregates_lock = threading.Lock()
+
+def get_aggregates(downloads_folder):
+    # Con una base de datos los promedios se calculan en SQL (SqlSource tiene city_means/year_means)
+    source = get_sql_source()
+    if source is not None:
+        return source
+    df, version = load_data_with_version(downloads_folder)
+    with _aggregates_lock:
+        cached = _aggregates.get(downloads_folder)
+        if cached is None or cached[0] != version:
+            cached = (version, PriceAggregates(df))
+            _aggregates[downloads_folder] = cached
+        return cached[1]
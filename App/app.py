@@ -1,12 +1,19 @@
 import os
-from dash import Dash, Input, Output
+import json
+from flask import jsonify
+from dash import Dash, Input, Output, State, no_update
 import dash_bootstrap_components as dbc
-from layout import create_layout
+from layout import create_layout, build_kpi_cards
 import plotly.express as px
 import plotly.graph_objs as go
+import plotly.io as pio
 import pandas as pd
 import dash_bootstrap_components as dbc
-from data_loader import load_data
+from data_loader import data_version, load_range
+from figure_cache import FigureCache, figure_patch
+from aggregates import get_aggregates
+from table_query import query_table
+from decimation import decimate_prices
 from dotenv import load_dotenv
 
 # Cargar las variables de entorno desde el archivo .env
@@ -29,36 +36,40 @@ app = Dash(
     meta_tags=tags,
     external_stylesheets=styles
 )
-# Cargar el layout
-app.layout = create_layout()
-
-@app.callback(
-    [Output('fig1-graph', 'figure'),
-     Output('fig2-graph', 'figure'),
-     Output('fig3-graph', 'figure'),
-     Output('fig4-graph', 'figure')],
-    [Input('date-picker-range', 'start_date'),
-     Input('date-picker-range', 'end_date')]
+# Cargar el layout: se pasa la función para que se construya en cada carga de página y no al importar
+app.layout = create_layout
+
+# Caché LRU de figuras serializadas por (gráfico, inicio, fin, versión del dataset, modo de área); opcionalmente en disco
+figure_cache = FigureCache(
+    maxsize=int(os.getenv('FIGURE_CACHE_SIZE', 32)),
+    cache_dir=os.getenv('FIGURE_CACHE_DIR') or None,
+    disk_maxsize=int(os.getenv('FIGURE_CACHE_DISK_SIZE', 256))
 )
-def update_graphs(start_date, end_date):
-
-    # Cargar datos
-    downloads_folder = "../Download"
-    df = load_data(downloads_folder)
-    
-    # Convertir las fechas de inicio y fin a datetime
-    start_date = pd.to_datetime(start_date)
-    end_date = pd.to_datetime(end_date)
 
-    # Filtrar datos según el rango de fechas
-    filtered_data = df[(df['fecha'] >= start_date) & (df['fecha'] <= end_date)]
-
-    # Ordenar los datos por fecha en orden ascendente
-    filtered_data = filtered_data.sort_values(by='fecha')
-
-    # Gráfico 1: Gráfico de área para Gasolina
-    fig1 = px.area(
-        filtered_data,
+# Aciertos y fallos de la caché de figuras
+@app.server.route('/cache-stats')
+def cache_stats():
+    return jsonify(figure_cache.stats())
+
+DOWNLOADS_FOLDER = "../Download"
+
+# Modo de dibujo de los gráficos de área: 'full', 'bucket' (cubetas de tiempo) o 'lttb' (submuestreo),
+# con un máximo de puntos por ciudad y, opcionalmente, solo las N ciudades principales más la banda 'Otras'
+AREA_RENDER_MODE = os.getenv('AREA_RENDER_MODE', 'bucket')
+AREA_MAX_POINTS = int(os.getenv('AREA_MAX_POINTS', 500))
+AREA_TOP_CITIES = int(os.getenv('AREA_TOP_CITIES', 0))
+AREA_SETTINGS = (AREA_RENDER_MODE, AREA_MAX_POINTS, AREA_TOP_CITIES)
+
+# Gráfico 1: Gráfico de área para Gasolina
+def build_fig1(start_date, end_date):
+    # Filas del rango de fechas, ordenadas por fecha (en memoria o filtradas en SQL según DATA_SOURCE)
+    filtered_data = load_range(DOWNLOADS_FOLDER, start_date, end_date, ['Ciudad', 'Gasolina MC ($/gal)'])
+    area_data = decimate_prices(
+        filtered_data, 'Gasolina MC ($/gal)', start_date, end_date,
+        mode=AREA_RENDER_MODE, max_points=AREA_MAX_POINTS, top_n=AREA_TOP_CITIES
+    )
+    return px.area(
+        area_data,
         x='fecha',
         y='Gasolina MC ($/gal)',
         color='Ciudad',
@@ -67,9 +78,15 @@ def update_graphs(start_date, end_date):
         template='plotly_white'
     )
 
-    # Gráfico 2: Gráfico de área para ACPM
-    fig2 = px.area(
-        filtered_data,
+# Gráfico 2: Gráfico de área para ACPM
+def build_fig2(start_date, end_date):
+    filtered_data = load_range(DOWNLOADS_FOLDER, start_date, end_date, ['Ciudad', 'ACPM ($/gal)'])
+    area_data = decimate_prices(
+        filtered_data, 'ACPM ($/gal)', start_date, end_date,
+        mode=AREA_RENDER_MODE, max_points=AREA_MAX_POINTS, top_n=AREA_TOP_CITIES
+    )
+    return px.area(
+        area_data,
         x='fecha',
         y='ACPM ($/gal)',
         color='Ciudad',
@@ -78,11 +95,10 @@ def update_graphs(start_date, end_date):
         template='plotly_white'
     )
 
-    # Gráfico 3: Comparación de promedios de ACPM y Gasolina MC
-    avg_prices = filtered_data.groupby(filtered_data['fecha'].dt.year).agg(
-        Promedio_Gasolina=('Gasolina MC ($/gal)', 'mean'),
-        Promedio_ACPM=('ACPM ($/gal)', 'mean')
-    ).reset_index()
+# Gráfico 3: Comparación de promedios de ACPM y Gasolina MC
+def build_fig3(start_date, end_date):
+    # Agregados precalculados (sumas acumuladas por fecha, ciudad y año)
+    avg_prices = get_aggregates(DOWNLOADS_FOLDER).year_means(start_date, end_date)
 
     fig3 = go.Figure()
     # Agregar barras para el promedio de Gasolina
@@ -113,11 +129,13 @@ def update_graphs(start_date, end_date):
         bargap=0.15, 
         bargroupgap=0.1 
     )
+    return fig3
+
+# Gráfico 4: Gráfico de burbujas para Gasolina MC por ciudad
+def build_fig4(start_date, end_date):
+    avg_gasolina_by_city = get_aggregates(DOWNLOADS_FOLDER).city_means(start_date, end_date)[['Ciudad', 'Gasolina MC ($/gal)']]
 
-    # Gráfico 4: Gráfico de burbujas para Gasolina MC por ciudad
-    avg_gasolina_by_city = filtered_data.groupby('Ciudad')['Gasolina MC ($/gal)'].mean().reset_index()
-    
-    fig4 = px.scatter(
+    return px.scatter(
         avg_gasolina_by_city,
         x='Ciudad',  # Eje X: Ciudad
         y='Gasolina MC ($/gal)',  # Eje Y: Precio promedio de Gasolina
@@ -128,8 +146,70 @@ def update_graphs(start_date, end_date):
         template='plotly_white'
     )
 
+FIGURE_BUILDERS = {'fig1': build_fig1, 'fig2': build_fig2, 'fig3': build_fig3, 'fig4': build_fig4}
+
+def render_figure(name, start_date, end_date, rendered_key):
+    """
+    Devuelve (figura o actualización parcial, clave de lo que queda dibujado).
+    Si el gráfico ya muestra el mismo rango y versión del dataset no se envía
+    nada; si la figura anterior sigue en la caché se envía solo la diferencia
+    (dash.Patch) y, en otro caso, la figura completa.
+    """
+    version = data_version(DOWNLOADS_FOLDER)
+
+    # Convertir las fechas de inicio y fin a datetime
+    start_date = pd.to_datetime(start_date)
+    end_date = pd.to_datetime(end_date)
+
+    key = (name, start_date.date().isoformat(), end_date.date().isoformat(), version, *AREA_SETTINGS)
+    if rendered_key is not None and tuple(rendered_key) == key:
+        return no_update, no_update
+
+    # Rangos repetidos con el mismo dataset se responden desde la caché de figuras
+    figure = figure_cache.get(key)
+    if figure is None:
+        figure = json.loads(pio.to_json(FIGURE_BUILDERS[name](start_date, end_date)))
+        figure_cache.set(key, figure)
+
+    previous = figure_cache.peek(tuple(rendered_key)) if rendered_key is not None else None
+    patch = figure_patch(previous, figure) if previous is not None else None
+    return (figure if patch is None else patch), list(key)
+
+# Un callback por gráfico: cada figura se calcula y se envía por separado
+def register_figure_callback(name):
+    @app.callback(
+        [Output(f'{name}-graph', 'figure'),
+         Output(f'{name}-rendered', 'data')],
+        [Input('date-picker-range', 'start_date'),
+         Input('date-picker-range', 'end_date')],
+        State(f'{name}-rendered', 'data')
+    )
+    def update_figure(start_date, end_date, rendered_key):
+        return render_figure(name, start_date, end_date, rendered_key)
+    return update_figure
+
+for name in FIGURE_BUILDERS:
+    register_figure_callback(name)
+
+# Tarjetas de KPI a partir del resumen anual, al cargar la página
+@app.callback(
+    Output('kpi-row', 'children'),
+    Input('url', 'pathname')
+)
+def update_kpis(pathname):
+    return build_kpi_cards(os.path.join(DOWNLOADS_FOLDER, "resumen_combustibles_anuales.csv"))
 
-    return fig1, fig2, fig3, fig4
+# Tabla de precios: solo se envía al navegador la página pedida
+@app.callback(
+    [Output('precios-table', 'data'),
+     Output('precios-table', 'page_count')],
+    [Input('precios-table', 'page_current'),
+     Input('precios-table', 'page_size'),
+     Input('precios-table', 'sort_by'),
+     Input('precios-table', 'filter_query')]
+)
+def update_table(page_current, page_size, sort_by, filter_query):
+    return query_table(DOWNLOADS_FOLDER, page_current, page_size, sort_by, filter_query)
 
 if __name__ == '__main__':
     app.run(host='127.0.0.1', port=8000, debug=True)
\ No newline at end of file
@@ -1,24 +1,234 @@
+import numpy as np
 import pandas as pd
+import pyarrow.feather as feather
 import os
+import hashlib
+import threading
 
-def load_data(downloads_folder):
-    data_files = []
-    for file_name in os.listdir(downloads_folder):
-        if file_name.startswith("combustibles_") and file_name.endswith(".csv"):
-            data_files.append(os.path.join(downloads_folder, file_name))
-    
-    df_list = [pd.read_csv(file) for file in data_files]
-    df = pd.concat(df_list, ignore_index=True)
+# Almacén columnar consolidado que escribe la etapa de carga del ETL (Pipe/load.py)
+STORE_FILE = 'combustibles.feather'
+
+# Origen de datos de la aplicación (variable de entorno DATA_SOURCE): 'files' (CSV o almacén
+# columnar de la carpeta Download), 'postgres' (base que carga el ETL) o 'sqlite' (SQLITE_PATH)
+DEFAULT_DATA_SOURCE = 'files'
+DEFAULT_SQLITE_PATH = '../Download/combustibles.db'
+
+# Cargadores compartidos por todo el proceso: {ruta: IncrementalLoader | StoreLoader}
+_loaders = {}
+_loaders_lock = threading.Lock()
+
+def _folder_signature(downloads_folder):
+    # La firma cambia solo si se agrega, elimina o modifica un combustibles_*.csv (o .csv.gz)
+    signature = {}
+    with os.scandir(downloads_folder) as entries:
+        for entry in entries:
+            if entry.name.startswith("combustibles_") and entry.name.endswith((".csv", ".csv.gz")):
+                stat = entry.stat()
+                signature[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    return signature
+
+def _version_stamp(signature):
+    # Versión estable (entre procesos) del dataset a partir de su firma en disco
+    return hashlib.sha1(repr(sorted(signature.items())).encode('utf-8')).hexdigest()[:16]
+
+def _read_file(file_path):
+    # pandas detecta la compresión por la extensión (.csv.gz)
+    df = pd.read_csv(file_path)
     # Unir "Bogotá D.C." y "Bogotá" en una sola entrada
     df['Ciudad'] = df['Ciudad'].replace({'Bogotá D.C.': 'Bogotá'})
     # Convertir la columna 'fecha' al formato datetime
     df['fecha'] = pd.to_datetime(df['fecha'], format='%d-%m-%Y', errors='coerce')
     return df
 
+def _sort_by_date(df):
+    return df.sort_values(by=['fecha', 'Ciudad'], kind='stable', na_position='last').reset_index(drop=True)
+
+class IncrementalLoader:
+    """
+    Mantiene en memoria cada combustibles_*.csv ya leído y, al refrescar,
+    solo vuelve a leer los archivos cuyo nombre, tamaño o fecha de
+    modificación cambió. `files_read` indica cuántos archivos se leyeron
+    en el último refresco, `total_files` cuántos componen el dataset y
+    `version` identifica el contenido cargado (cambia solo si cambian los archivos).
+    """
+
+    def __init__(self, downloads_folder):
+        self.downloads_folder = downloads_folder
+        self.files_read = 0
+        self.total_files = 0
+        self.version = None
+        self._partitions = {}  # {nombre: ((tamaño, mtime), DataFrame)}
+        self._combined = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        with self._lock:
+            signature = _folder_signature(self.downloads_folder)
+            changed = sorted(
+                name for name, stamp in signature.items()
+                if name not in self._partitions or self._partitions[name][0] != stamp
+            )
+            removed = [name for name in self._partitions if name not in signature]
+
+            self.files_read = len(changed)
+            self.total_files = len(signature)
+            if self._combined is not None and not changed and not removed:
+                return self._combined
+            self.version = _version_stamp(signature)
+
+            only_new = not removed and not any(name in self._partitions for name in changed)
+            new_frames = []
+            for name in changed:
+                df = _read_file(os.path.join(self.downloads_folder, name))
+                self._partitions[name] = (signature[name], df)
+                new_frames.append(df)
+            for name in removed:
+                del self._partitions[name]
+
+            if only_new and self._combined is not None:
+                # Solo hay archivos nuevos: se agregan al final del dataset existente
+                self._combined = pd.concat([self._combined] + new_frames, ignore_index=True)
+            else:
+                # Hubo archivos reemplazados o eliminados: se rearma desde las particiones
+                self._combined = pd.concat(
+                    [self._partitions[name][1] for name in sorted(self._partitions)],
+                    ignore_index=True
+                )
+            # Orden por fecha (y ciudad) para poder filtrar rangos con búsqueda binaria
+            self._combined = _sort_by_date(self._combined)
+            self._combined.attrs['version'] = self.version
+            return self._combined
+
+class StoreLoader:
+    """
+    Lee el almacén columnar consolidado mapeándolo en memoria y lo mantiene
+    mientras el archivo no cambie. Como el almacén se escribe sin compresión,
+    ordenado y con las ciudades ya normalizadas, las columnas numéricas y de
+    fecha quedan respaldadas por las páginas del archivo: varios procesos que
+    lo leen comparten la misma memoria (la caché de páginas del sistema) en
+    lugar de tener cada uno su propia copia. El ETL publica una versión nueva
+    reemplazando el archivo de forma atómica, y cada refresco solo hace un
+    stat() para detectarlo. Expone los mismos atributos que IncrementalLoader.
+    """
+
+    def __init__(self, store_path):
+        self.store_path = store_path
+        self.files_read = 0
+        self.total_files = 1
+        self.version = None
+        self._stamp = None
+        self._combined = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        with self._lock:
+            stat = os.stat(self.store_path)
+            # El inodo cambia con cada os.replace() del ETL, aunque tamaño y fecha coincidan
+            stamp = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            if self._combined is not None and stamp == self._stamp:
+                self.files_read = 0
+                return self._combined
+
+            table = feather.read_table(self.store_path, memory_map=True)
+            # split_blocks evita consolidar columnas en bloques nuevos (sin copia cuando es posible)
+            df = table.to_pandas(split_blocks=True)
+            if 'Bogotá D.C.' in set(df['Ciudad'].astype('category').cat.categories):
+                # Almacenes escritos antes de normalizar las ciudades en el ETL
+                df['Ciudad'] = df['Ciudad'].astype(str).replace({'Bogotá D.C.': 'Bogotá'}).astype('category')
+            if not df['fecha'].is_monotonic_increasing or df['fecha'].isna().any():
+                df = _sort_by_date(df)
+            self._combined = df
+            self._stamp = stamp
+            self.version = _version_stamp({self.store_path: stamp})
+            df.attrs['version'] = self.version
+            self.files_read = 1
+            return self._combined
+
+def get_loader(downloads_folder):
+    key = os.path.abspath(downloads_folder)
+    store_path = os.path.join(key, STORE_FILE)
+    # Si el ETL ya generó el almacén columnar se prefiere a los CSV por fecha
+    use_store = os.path.exists(store_path)
+    loader_key = store_path if use_store else key
+    with _loaders_lock:
+        if loader_key not in _loaders:
+            _loaders[loader_key] = StoreLoader(store_path) if use_store else IncrementalLoader(key)
+        return _loaders[loader_key]
+
+def load_data(downloads_folder):
+    """
+    Devuelve el dataset de precios combinado y ordenado por fecha y ciudad,
+    reutilizando la copia en memoria.
+    Si existe el almacén columnar se lee de allí; si no, se leen únicamente
+    los combustibles_*.csv nuevos o modificados.
+    El DataFrame devuelto es compartido entre llamadas: no debe modificarse
+    en sitio (usar .assign() o .copy() para derivar columnas).
+    """
+    df = get_loader(downloads_folder).refresh()
+
+    # Copia superficial: comparte los datos con la caché, pero cualquier
+    # asignación sobre ella no altera la versión compartida
+    return df.copy(deep=False)
+
+def load_data_with_version(downloads_folder):
+    # Igual que load_data, pero devuelve también la versión del dataset cargado
+    df = load_data(downloads_folder)
+    return df, df.attrs.get('version')
+
+def get_sql_source():
+    """
+    Origen SQL configurado (db_source.SqlSource) o None si los datos se leen
+    de la carpeta Download. Se consulta el entorno en cada llamada para
+    respetar las variables que se cargan desde .env al iniciar la aplicación.
+    """
+    kind = os.getenv('DATA_SOURCE', DEFAULT_DATA_SOURCE)
+    if kind == 'files':
+        return None
+    from db_source import get_source
+    return get_source(kind, os.getenv('SQLITE_PATH', DEFAULT_SQLITE_PATH))
+
+def data_version(downloads_folder):
+    # Versión del dataset del origen configurado (clave de las cachés de figuras)
+    source = get_sql_source()
+    if source is not None:
+        return source.version()
+    return get_loader(downloads_folder).refresh().attrs.get('version')
+
+def load_range(downloads_folder, start_date, end_date, columns=None):
+    """
+    Filas con fecha en [start_date, end_date] ordenadas por fecha y ciudad,
+    del origen configurado: con una base de datos el rango se filtra en SQL y
+    solo se traen esas filas (y las columnas pedidas, además de 'fecha');
+    con archivos se recorta el dataset en memoria con filter_date_range.
+    """
+    source = get_sql_source()
+    if source is not None:
+        return source.prices_in_range(start_date, end_date, columns)
+    df = filter_date_range(load_data(downloads_folder), start_date, end_date)
+    return df if columns is None else df[list(dict.fromkeys(columns + ['fecha']))]
+
+def filter_date_range(df, start_date, end_date):
+    """
+    Filas con fecha dentro de [start_date, end_date] de un DataFrame ordenado
+    por fecha (como el que devuelve load_data). Usa búsqueda binaria sobre la
+    columna 'fecha', por lo que el costo depende del tamaño del resultado y no
+    del histórico completo. El resultado conserva el orden por fecha.
+    """
+    fechas = df['fecha'].to_numpy()
+    start = np.datetime64(pd.Timestamp(start_date)).astype(fechas.dtype)
+    end = np.datetime64(pd.Timestamp(end_date)).astype(fechas.dtype)
+    i = fechas.searchsorted(start, side='left')
+    j = fechas.searchsorted(end, side='right')
+    return df.iloc[i:j]
+
 def load_annual_data(resumen_file):
+    # Con una base de datos configurada, el resumen se lee de resumen_combustibles_anuales
+    source = get_sql_source()
+    if source is not None:
+        return source.annual_summary()
     return pd.read_csv(resumen_file)
 
 def calcular_porcentaje(cambio_actual, cambio_anterior):
     if cambio_anterior == 0:
         return 0
-    return ((cambio_actual - cambio_anterior) / cambio_anterior) * 100
\ No newline at end of file
+    return ((cambio_actual - cambio_anterior) / cambio_anterior) * 100
@@ -0,0 +1,365 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+import pandas as pd
+
+# Lectura del dataset desde la base de datos que carga el ETL (PostgreSQL) o desde
+# un SQLite local con el mismo esquema. El filtro por rango de fechas y los
+# agregados se resuelven en SQL sobre el índice (fecha, ciudad) de la restricción
+# UNIQUE: cada proceso solo recibe las filas o los promedios que va a dibujar.
+
+TABLE = os.getenv('DB_TABLE', 'precios_combustibles')
+RESUMEN_TABLE = os.getenv('DB_RESUMEN_TABLE', 'resumen_combustibles_anuales')
+
+# Segundos durante los que se reutiliza la versión del dataset antes de volver a consultarla
+VERSION_TTL = float(os.getenv('DB_VERSION_TTL', 30))
+
+GASOLINA = 'Gasolina MC ($/gal)'
+ACPM = 'ACPM ($/gal)'
+
+# Diferencias de SQL entre motores: marcador de parámetros, año de una fecha y búsqueda de texto
+DIALECTS = {
+    'postgres': {
+        'placeholder': '%s',
+        'year': "CAST(EXTRACT(YEAR FROM fecha) AS INTEGER)",
+        'position': "strpos({text}, {value})"
+    },
+    'sqlite': {
+        'placeholder': '?',
+        'year': "CAST(strftime('%Y', fecha) AS INTEGER)",
+        'position': "instr({text}, {value})"
+    }
+}
+
+# Unir "Bogotá D.C." y "Bogotá" como en la lectura de archivos
+CITY = "CASE WHEN ciudad = 'Bogotá D.C.' THEN 'Bogotá' ELSE ciudad END"
+
+SQL_OPERATORS = {'=': '=', '!=': '<>', '<': '<', '<=': '<=', '>': '>', '>=': '>='}
+
+def _real(expression):
+    # DECIMAL de PostgreSQL -> float (en SQLite ya es REAL)
+    return f"CAST({expression} AS DOUBLE PRECISION)"
+
+def _iso(value):
+    return pd.Timestamp(value).date().isoformat()
+
+class SqlSource:
+    """
+    Origen de datos en una base SQL (PostgreSQL o SQLite). Expone lo que usan
+    los gráficos y la tabla: filas de un rango de fechas, promedios por ciudad
+    y por año (con la misma forma que PriceAggregates), una página de la tabla
+    y el resumen anual. Las conexiones se reutilizan: un pool compartido por
+    los hilos del proceso en PostgreSQL y una conexión de solo lectura por
+    hilo en SQLite.
+    """
+
+    def __init__(self, kind, target, table=TABLE, resumen_table=RESUMEN_TABLE):
+        for name in (table, resumen_table):
+            if not re.fullmatch(r'\w+', name):
+                raise ValueError(f"Nombre de tabla no válido: {name}")
+        self.kind = kind
+        self.target = target
+        self.table = table
+        self.resumen_table = resumen_table
+        self.dialect = DIALECTS[kind]
+        self.columns = {
+            'No.': 'numero',
+            'Ciudad': CITY,
+            GASOLINA: 'gasolina_mc',
+            ACPM: 'acpm',
+            'year': self.dialect['year']
+        }
+        self._version = None
+        self._version_checked = 0.0
+        self._version_stamp = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pool = None
+        if kind == 'postgres':
+            from psycopg2.pool import ThreadedConnectionPool
+            self._pool = ThreadedConnectionPool(1, int(os.getenv('DB_POOL_SIZE', 4)), **target)
+
+    @contextmanager
+    def connection(self):
+        if self._pool is None:
+            # build_sqlite publica una base nueva con os.replace: una conexión abierta seguiría
+            # leyendo el archivo anterior, así que se vuelve a abrir cuando cambia el archivo
+            stamp = self._file_stamp()
+            conn, conn_stamp = getattr(self._local, 'conn', (None, None))
+            if conn is None or conn_stamp != stamp:
+                if conn is not None:
+                    conn.close()
+                # Solo lectura: la aplicación nunca modifica la base
+                uri = Path(self.target).absolute().as_uri() + '?mode=ro'
+                conn = sqlite3.connect(uri, uri=True)
+                self._local.conn = (conn, stamp)
+            yield conn
+            return
+
+        import psycopg2
+        conn = self._pool.getconn()
+        broken = False
+        try:
+            if not conn.autocommit:
+                # Sin transacciones abiertas entre consultas
+                conn.set_session(readonly=True, autocommit=True)
+            yield conn
+        except psycopg2.OperationalError:
+            # Conexión caída: se descarta en lugar de devolverla al pool
+            broken = True
+            raise
+        finally:
+            self._pool.putconn(conn, close=broken)
+
+    def _file_stamp(self):
+        # Identidad del archivo SQLite: cambia con cada reemplazo o modificación
+        if self._pool is not None:
+            return None
+        stat = os.stat(self.target)
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.closeall()
+
+    def query(self, statement, params=()):
+        statement = statement.replace('?', self.dialect['placeholder'])
+        with self.connection() as conn:
+            cur = conn.cursor()
+            try:
+                cur.execute(statement, tuple(params))
+                columns = [description[0] for description in cur.description]
+                rows = cur.fetchall()
+            finally:
+                cur.close()
+        return pd.DataFrame(rows, columns=columns)
+
+    def version(self):
+        """
+        Versión del contenido de la tabla de precios (filas, fechas extremas y
+        sumas de precios). Se consulta como máximo cada DB_VERSION_TTL segundos
+        y, en SQLite, también cuando se reemplaza el archivo.
+        """
+        with self._lock:
+            stamp = self._file_stamp()
+            expired = time.monotonic() - self._version_checked > VERSION_TTL
+            if self._version is None or expired or stamp != self._version_stamp:
+                row = self.query(
+                    f"SELECT COUNT(*), MIN(fecha), MAX(fecha), SUM(gasolina_mc), SUM(acpm) FROM {self.table}"
+                ).iloc[0].tolist()
+                self._version = hashlib.sha1(repr((self.kind, row)).encode('utf-8')).hexdigest()[:16]
+                self._version_checked = time.monotonic()
+                self._version_stamp = stamp
+            return self._version
+
+    def prices_in_range(self, start_date, end_date, columns=None):
+        """Filas con fecha en [start_date, end_date], ordenadas por fecha y ciudad (como filter_date_range)."""
+        columns = columns or ['No.', 'Ciudad', GASOLINA, ACPM]
+        select = ', '.join(
+            f'{_real(self.columns[c]) if c in (GASOLINA, ACPM) else self.columns[c]} AS "{c}"'
+            for c in columns if c != 'fecha'
+        )
+        df = self.query(
+            f"SELECT {select}, fecha FROM {self.table} "
+            f"WHERE fecha >= ? AND fecha <= ? ORDER BY fecha, ciudad",
+            (_iso(start_date), _iso(end_date))
+        )
+        df['fecha'] = pd.to_datetime(df['fecha'])
+        return df
+
+    def city_means(self, start_date, end_date):
+        """Promedio de Gasolina MC y ACPM por ciudad en el rango (mismo resultado que PriceAggregates)."""
+        return self.query(
+            f'SELECT {CITY} AS "Ciudad", {_real("AVG(gasolina_mc)")} AS "{GASOLINA}", {_real("AVG(acpm)")} AS "{ACPM}" '
+            f"FROM {self.table} WHERE fecha >= ? AND fecha <= ? GROUP BY 1 ORDER BY 1",
+            (_iso(start_date), _iso(end_date))
+        )
+
+    def year_means(self, start_date, end_date):
+        """Promedio de Gasolina MC y ACPM por año en el rango (mismo resultado que PriceAggregates)."""
+        return self.query(
+            f'SELECT {self.dialect["year"]} AS fecha, {_real("AVG(gasolina_mc)")} AS "Promedio_Gasolina", '
+            f'{_real("AVG(acpm)")} AS "Promedio_ACPM" '
+            f"FROM {self.table} WHERE fecha >= ? AND fecha <= ? GROUP BY 1 ORDER BY 1",
+            (_iso(start_date), _iso(end_date))
+        )
+
+    def annual_summary(self):
+        # Mismas columnas que resumen_combustibles_anuales.csv
+        summary = ', '.join(
+            f"{_real(column)} AS {alias}" for column, alias in [
+                ('max_gasolina_mc', 'gasolina_max'), ('min_gasolina_mc', 'gasolina_min'),
+                ('avg_gasolina_mc', 'gasolina_avg'), ('max_acpm', 'acpm_max'),
+                ('min_acpm', 'acpm_min'), ('avg_acpm', 'acpm_avg')
+            ]
+        )
+        return self.query(f"SELECT year, {summary} FROM {self.resumen_table} ORDER BY year DESC")
+
+    def _filter_condition(self, column, operator, value, case_sensitive):
+        # (condición SQL, parámetros) equivalente a _apply_filter de table_query; None = sin efecto
+        if column not in self.columns:
+            return None
+        expression = self.columns[column]
+        numeric = column != 'Ciudad'
+        if operator in ('contains', 'datestartswith'):
+            text = f"CAST({expression} AS TEXT)" if numeric else expression
+            if column in (GASOLINA, ACPM):
+                # Sin ceros finales (16259.00 -> "16259"), como table_query._as_text
+                text = f"rtrim(rtrim({text}, '0'), '.')"
+            value = str(value)
+            if operator == 'datestartswith':
+                return f"substr({text}, 1, {len(value)}) = ?", [value]
+            if not case_sensitive:
+                text, value = f"LOWER({text})", value.lower()
+            return self.dialect['position'].format(text=text, value='?') + " > 0", [value]
+
+        if numeric and not isinstance(value, float):
+            # Texto comparado con una columna numérica: no hay coincidencias posibles salvo "!="
+            return None if operator == '!=' else ("1 = 0", [])
+        if not numeric:
+            value = str(value) if not isinstance(value, float) or not value.is_integer() else str(int(value))
+            if not case_sensitive:
+                expression, value = f"LOWER({expression})", value.lower()
+        if operator not in SQL_OPERATORS:
+            return None
+        return f"{expression} {SQL_OPERATORS[operator]} ?", [value]
+
+    def query_page(self, date_ranges, filters, sort_by, page_current, page_size):
+        """
+        (filas de la página, cantidad de páginas) de la tabla de precios. Los
+        rangos de fechas (filtros de año) usan el índice sobre la fecha; el
+        resto de filtros, el orden y la paginación también se resuelven en SQL.
+        """
+        conditions, params = [], []
+        for start, end in date_ranges:
+            conditions.append("fecha >= ? AND fecha <= ?")
+            params += [_iso(start), _iso(end)]
+        for condition in filters:
+            result = self._filter_condition(*condition)
+            if result is not None:
+                conditions.append(result[0])
+                params += result[1]
+        where = f"WHERE {' AND '.join(f'({c})' for c in conditions)}" if conditions else ''
+
+        total = int(self.query(f"SELECT COUNT(*) AS total FROM {self.table} {where}", params).iloc[0, 0])
+
+        # Orden: por defecto del año más reciente al más antiguo, como en la lectura de archivos
+        order = [
+            f"{self.columns[col['column_id']]} {'ASC' if col['direction'] == 'asc' else 'DESC'}"
+            for col in (sort_by or []) if col['column_id'] in self.columns
+        ]
+        order = order + ['fecha', 'ciudad'] if order else ['fecha DESC', 'ciudad DESC']
+
+        page_size = page_size or 10
+        page_current = page_current or 0
+        page = self.query(
+            f'SELECT numero AS "No.", {CITY} AS "Ciudad", {_real("gasolina_mc")} AS "{GASOLINA}", '
+            f'{_real("acpm")} AS "{ACPM}", {self.dialect["year"]} AS year '
+            f"FROM {self.table} {where} ORDER BY {', '.join(order)} LIMIT ? OFFSET ?",
+            params + [page_size, page_current * page_size]
+        )
+        page_count = max(1, -(-total // page_size))
+        return page.to_dict('records'), page_count
+
+# Orígenes del proceso, uno por base de datos (y por proceso: las conexiones no se comparten tras un fork)
+_sources = {}
+_sources_lock = threading.Lock()
+
+def _postgres_config():
+    # Mismas variables de entorno que el ETL (Pipe/config.py)
+    return {
+        'host': os.getenv('DB_HOST'),
+        'dbname': os.getenv('DB_NAME'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'port': int(os.getenv('DB_PORT', 5432))
+    }
+
+def get_source(kind, sqlite_path):
+    if kind not in DIALECTS:
+        raise ValueError(f"DATA_SOURCE no válido: {kind} (use files, postgres o sqlite)")
+    target = _postgres_config() if kind == 'postgres' else os.path.abspath(sqlite_path)
+    key = (kind, repr(target), os.getpid())
+    with _sources_lock:
+        if key not in _sources:
+            _sources[key] = SqlSource(kind, target)
+        return _sources[key]
+
+SQLITE_SCHEMA = """
+CREATE TABLE {table} (
+    id INTEGER PRIMARY KEY,
+    numero INTEGER,
+    fecha TEXT NOT NULL,
+    ciudad TEXT NOT NULL,
+    gasolina_mc REAL,
+    acpm REAL,
+    CONSTRAINT uq_fecha_ciudad UNIQUE (fecha, ciudad)
+);
+CREATE TABLE {resumen_table} (
+    year INTEGER PRIMARY KEY,
+    max_gasolina_mc REAL, min_gasolina_mc REAL, avg_gasolina_mc REAL,
+    max_acpm REAL, min_acpm REAL, avg_acpm REAL
+);
+"""
+
+def build_sqlite(downloads_folder, db_path, table=TABLE, resumen_table=RESUMEN_TABLE):
+    """
+    Crea una base SQLite con el esquema de PostgreSQL a partir de la carpeta
+    Download (almacén columnar o CSV y resumen anual), para usar la lectura
+    desde base de datos sin un servidor. Se escribe en un archivo temporal y
+    se reemplaza de forma atómica. Como en PostgreSQL, la clave es (fecha,
+    ciudad): de las filas repetidas solo queda la última (INSERT OR REPLACE),
+    mientras que los archivos las conservan todas. Devuelve las filas
+    guardadas y las reemplazadas por repetidas.
+    """
+    from data_loader import get_loader
+
+    df = get_loader(downloads_folder).refresh()
+    df = df.dropna(subset=['fecha', 'Ciudad'])
+    prices = pd.DataFrame({
+        'numero': df['No.'].astype('Int64'),
+        'fecha': df['fecha'].dt.strftime('%Y-%m-%d'),
+        'ciudad': df['Ciudad'].astype(str),
+        'gasolina_mc': df[GASOLINA],
+        'acpm': df[ACPM]
+    }).astype(object)
+    prices = prices.where(prices.notna(), None)
+
+    tmp_path = f"{db_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SQLITE_SCHEMA.format(table=table, resumen_table=resumen_table))
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {table} (numero, fecha, ciudad, gasolina_mc, acpm) VALUES (?, ?, ?, ?, ?)",
+            prices.itertuples(index=False, name=None)
+        )
+        resumen_file = os.path.join(downloads_folder, "resumen_combustibles_anuales.csv")
+        if os.path.exists(resumen_file):
+            resumen = pd.read_csv(resumen_file)
+            columns = ['year', 'gasolina_max', 'gasolina_min', 'gasolina_avg', 'acpm_max', 'acpm_min', 'acpm_avg']
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {resumen_table} VALUES (?, ?, ?, ?, ?, ?, ?)",
+                resumen[columns].astype(object).itertuples(index=False, name=None)
+            )
+        conn.commit()
+        stored = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    return stored, len(prices) - stored
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Crea la base SQLite local (DATA_SOURCE=sqlite) a partir de la carpeta Download.")
+    parser.add_argument('--downloads', default='../Download', help="Carpeta con los datos del ETL")
+    parser.add_argument('-o', '--output', default='../Download/combustibles.db', help="Archivo SQLite a crear")
+    args = parser.parse_args()
+    rows, replaced = build_sqlite(args.downloads, args.output)
+    print(f"Base SQLite creada: {args.output} ({rows} filas, {replaced} repetidas por (fecha, ciudad) reemplazadas)")
@@ -0,0 +1,111 @@
+import numpy as np
+import pandas as pd
+
+OTHERS_LABEL = 'Otras'
+
+# Tamaños de cubeta candidatos (frecuencia de pandas, duración aproximada en días), de menor a mayor
+BUCKET_FREQUENCIES = [('D', 1), ('W', 7), ('MS', 30.44), ('QS', 91.31), ('YS', 365.25)]
+
+def bucket_frequency(start_date, end_date, max_points):
+    # Cubeta más fina que deja como máximo `max_points` puntos por ciudad en el rango pedido
+    span_days = max((pd.Timestamp(end_date) - pd.Timestamp(start_date)).days + 1, 1)
+    for freq, days in BUCKET_FREQUENCIES:
+        if span_days / days <= max_points:
+            return freq
+    return BUCKET_FREQUENCIES[-1][0]
+
+def lttb_indices(x, y, threshold):
+    """
+    Índices de los puntos que conserva el algoritmo Largest-Triangle-Three-Buckets
+    para dejar `threshold` puntos de la serie (x, y), con x ordenado. Siempre
+    conserva el primero y el último; si la serie ya es corta la deja igual.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for k in range(threshold - 2):
+        start, end = edges[k], edges[k + 1]
+        # Promedio de la cubeta siguiente (o el último punto)
+        next_start, next_end = end, edges[k + 2] if k + 2 < len(edges) else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # Punto de la cubeta actual que forma el triángulo de mayor área
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.nanargmax(areas)) if np.isfinite(areas).any() else start
+        selected[k + 1] = a
+    return selected
+
+def group_top_cities(df, column, top_n):
+    """
+    Conserva las `top_n` ciudades que más aportan al área apilada (mayor suma
+    de `column` en el rango) y suma las demás, por fecha, en una banda 'Otras'
+    (así el área apilada mantiene su altura total).
+    """
+    cities = df['Ciudad'].astype(str)
+    totals = df[column].groupby(cities).sum().sort_values(ascending=False)
+    if top_n <= 0 or len(totals) <= top_n:
+        return df.assign(Ciudad=cities)
+
+    top = totals.index[:top_n]
+    is_top = cities.isin(top)
+    kept = df.loc[is_top, ['fecha', column]].assign(Ciudad=cities[is_top])
+    others = (
+        df.loc[~is_top].groupby('fecha', as_index=False)[column].sum(min_count=1)
+        .assign(Ciudad=OTHERS_LABEL)
+    )
+    return pd.concat([kept, others], ignore_index=True).sort_values(['fecha', 'Ciudad'], kind='stable')
+
+def decimate_prices(df, column, start_date, end_date, mode='bucket', max_points=500, top_n=0):
+    """
+    Serie de `column` por fecha y ciudad lista para un gráfico de área, con
+    como máximo `max_points` puntos por ciudad:
+    - 'full': sin reducción.
+    - 'bucket': promedio por cubetas de tiempo (día, semana, mes, trimestre o
+      año) según el ancho del rango pedido, rotulado con la última fecha de
+      vigencia de la cubeta.
+    - 'lttb': submuestreo LTTB sobre el total por fecha; las fechas elegidas se
+      conservan en todas las ciudades (puntos reales, mismo eje x en cada traza).
+    Si hay como máximo `max_points` fechas la serie se devuelve sin reducir.
+    Con `top_n` > 0 las ciudades fuera del top se agrupan en la banda 'Otras'.
+    `df` ya debe estar filtrado al rango y ordenado por fecha.
+    """
+    data = group_top_cities(df[['fecha', 'Ciudad', column]].dropna(subset=['fecha']), column, top_n)
+
+    # Si cada ciudad ya tiene como máximo `max_points` fechas no se reduce nada:
+    # los puntos se dibujan en sus fechas de vigencia reales
+    if data['fecha'].nunique() <= max_points:
+        mode = 'full'
+
+    if mode == 'bucket':
+        freq = bucket_frequency(start_date, end_date, max_points)
+        # Cada cubeta se rotula con la última fecha de vigencia observada en ella (no con el
+        # borde del periodo), la misma para todas las ciudades para que el área siga apilada
+        dates = pd.Series(data['fecha'].unique()).sort_values()
+        labels = pd.Series(dates.to_numpy(), index=dates.to_numpy()).groupby(pd.Grouper(freq=freq)).transform('last')
+        data = (
+            data.assign(fecha=data['fecha'].map(labels))
+            .groupby(['Ciudad', 'fecha'], sort=False)[column]
+            .mean().dropna().reset_index()
+            .sort_values(['fecha', 'Ciudad'], kind='stable')
+        )
+    elif mode == 'lttb':
+        # Las fechas se eligen una sola vez sobre el total por fecha (la altura del área apilada)
+        # y se conservan en todas las ciudades: así las trazas comparten el eje x y el área
+        # apilada no cae a cero en las fechas que una ciudad no tendría
+        totals = data.groupby('fecha', sort=True)[column].sum()
+        if len(totals) > max_points:
+            x = totals.index.to_numpy().astype('datetime64[ns]').astype(np.int64)
+            kept_dates = totals.index[lttb_indices(x, totals.to_numpy(), max_points)]
+            data = data[data['fecha'].isin(kept_dates)]
+
+    return data[['fecha', 'Ciudad', column]].reset_index(drop=True)
@@ -0,0 +1,188 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from dash import Patch, no_update
+
+logger = logging.getLogger(__name__)
+
+class FigureCache:
+    """
+    Caché de figuras ya serializadas (dicts JSON de Plotly) con desalojo LRU.
+    Si se indica `cache_dir`, cada entrada también se guarda en disco y se
+    recupera de allí cuando no está en memoria (por ejemplo, tras reiniciar
+    la aplicación o desde otro proceso). La carpeta conserva como máximo
+    `disk_maxsize` archivos: al escribir se borran los usados hace más
+    tiempo (por fecha de modificación, que se renueva en cada acierto), así
+    que las figuras de versiones anteriores del dataset terminan saliendo.
+    `hits` y `misses` cuentan los aciertos y fallos desde que se creó la caché.
+    """
+
+    def __init__(self, maxsize=32, cache_dir=None, disk_maxsize=256):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self.disk_maxsize = disk_maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _store(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    # Borra los archivos menos usados hasta dejar `disk_maxsize`; otros procesos
+    # pueden estar borrando los mismos archivos, así que se ignoran los que ya no existen
+    def _prune_disk(self):
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.name.endswith('.json'):
+                        try:
+                            entries.append((entry.stat().st_mtime_ns, entry.path))
+                        except FileNotFoundError:
+                            pass
+        except OSError:
+            return
+        if len(entries) <= self.disk_maxsize:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.disk_maxsize]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        value = None
+        if self.cache_dir and os.path.exists(self._path(key)):
+            try:
+                with open(self._path(key), encoding='utf-8') as f:
+                    value = json.load(f)
+            except (OSError, ValueError):
+                value = None
+            else:
+                # Marca el archivo como usado recientemente para el desalojo en disco
+                try:
+                    os.utime(self._path(key))
+                except OSError:
+                    pass
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, value)
+            return value
+
+    def peek(self, key):
+        # Consulta solo la memoria, sin contar aciertos/fallos ni alterar el orden LRU
+        with self._lock:
+            return self._entries.get(key)
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+        if self.cache_dir:
+            # Escritura atómica: otro proceso nunca lee un archivo a medias. El temporal tiene
+            # nombre único, porque varios hilos y procesos pueden guardar la misma clave a la vez
+            path = self._path(key)
+            tmp_path = None
+            try:
+                with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.cache_dir,
+                                                 suffix='.tmp', delete=False) as f:
+                    tmp_path = f.name
+                    json.dump(value, f)
+                os.replace(tmp_path, path)
+                self._prune_disk()
+            except OSError as e:
+                # El disco es opcional: la figura queda solo en memoria
+                logger.warning("No se pudo guardar la figura en %s: %s", self.cache_dir, e)
+                if tmp_path is not None and os.path.exists(tmp_path):
+                    try:
+                        os.remove(tmp_path)
+                    except OSError:
+                        pass
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'disk': bool(self.cache_dir),
+                'disk_maxsize': self.disk_maxsize if self.cache_dir else 0
+            }
+
+def figure_patch(previous, figure):
+    """
+    Actualización parcial (dash.Patch) que convierte la figura `previous` en
+    `figure`, ambas como dicts JSON de Plotly. Si las trazas coinciden
+    (cantidad, tipo y nombre) solo se envían sus propiedades modificadas; si
+    no, se reemplaza la lista de trazas completa. Del layout (que incluye la
+    plantilla) solo se envían las claves que cambiaron, y los ejes se vuelven
+    a ajustar automáticamente (descarta el zoom hecho en el navegador sobre
+    la figura anterior). Devuelve no_update si
+    no cambió nada y None si el layout perdió claves, en cuyo caso se debe
+    enviar la figura completa.
+    """
+    old_layout, new_layout = previous.get('layout', {}), figure.get('layout', {})
+    if set(old_layout) - set(new_layout):
+        return None
+
+    patch = Patch()
+    changed = False
+    old_data, new_data = previous.get('data', []), figure.get('data', [])
+    same_traces = len(old_data) == len(new_data) and all(
+        o.get('type') == n.get('type') and o.get('name') == n.get('name') and not set(o) - set(n)
+        for o, n in zip(old_data, new_data)
+    )
+    if same_traces:
+        for i, (old_trace, new_trace) in enumerate(zip(old_data, new_data)):
+            for prop, value in new_trace.items():
+                if old_trace.get(prop) != value:
+                    patch['data'][i][prop] = value
+                    changed = True
+    else:
+        patch['data'] = new_data
+        changed = True
+
+    for prop, value in new_layout.items():
+        if old_layout.get(prop) != value:
+            patch['layout'][prop] = value
+            changed = True
+
+    if not changed:
+        return no_update
+
+    # El zoom del navegador cambia xaxis/yaxis.range sin pasar por el servidor: como esas claves
+    # no difieren entre las dos figuras, se reactivan los ejes automáticos para que los datos
+    # nuevos no queden fuera de la vista (salvo en ejes con rango fijo en la figura)
+    axes = {'xaxis', 'yaxis'} | {prop for prop in new_layout if prop.startswith(('xaxis', 'yaxis'))}
+    for axis in sorted(axes):
+        if 'range' not in (new_layout.get(axis) or {}):
+            patch['layout'][axis]['autorange'] = True
+    return patch
@@ -0,0 +1,24 @@
+import os
+import multiprocessing
+
+# Configuración de gunicorn para producción: gunicorn -c gunicorn.conf.py wsgi:server
+bind = os.getenv('APP_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('APP_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv('APP_THREADS', 2))
+timeout = int(os.getenv('APP_TIMEOUT', 60))
+
+# Las rutas de datos de la aplicación son relativas a la carpeta App
+chdir = os.path.dirname(os.path.abspath(__file__))
+
+# Reiniciar cada proceso tras cierta cantidad de solicitudes (limita el crecimiento de memoria)
+max_requests = int(os.getenv('APP_MAX_REQUESTS', 1000))
+max_requests_jitter = 50
+
+# Cargar el dataset (mapeo del almacén columnar) o abrir la conexión a la base de datos
+# al iniciar cada proceso, no en su primera solicitud
+def post_worker_init(worker):
+    from data_loader import data_version
+    try:
+        data_version("../Download")
+    except Exception as e:
+        worker.log.warning(f"No se pudo precargar el dataset: {e}")
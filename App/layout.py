@@ -1,42 +1,18 @@
 import pandas as pd
-import plotly.express as px
 from dash import dcc, html
 from dash.dash_table import DataTable
 from dash.dash_table.Format import Format, Symbol
 import dash_bootstrap_components as dbc
-from data_loader import load_data, load_annual_data, calcular_porcentaje
+from data_loader import load_annual_data, calcular_porcentaje
 
 def create_layout():
-    downloads_folder = "../Download"
-    df = load_data(downloads_folder)
-    resumen_file = "../Download/resumen_combustibles_anuales.csv"
-    df_anual = load_annual_data(resumen_file)
-
-    # Procesar datos para gráficos
-    df_cities = df[['Ciudad', 'Gasolina MC ($/gal)', 'ACPM ($/gal)']].copy()
-    df_cities.columns = ['Ciudad', 'Gasolina_MC', 'ACPM']
-    
-    # Obtener el último año y datos para KPIs
-    ultimo_anio = df_anual['year'].max()
-    datos_ultimo_anio = df_anual[df_anual['year'] == ultimo_anio].iloc[0]
-    anio_anterior = ultimo_anio - 1
-    datos_anterior = df_anual[df_anual['year'] == anio_anterior].iloc[0]
-
-    # Calcular porcentajes para cada KPI
-    porcentaje_max_gasolina = calcular_porcentaje(datos_ultimo_anio['gasolina_max'], datos_anterior['gasolina_max'])
-    porcentaje_min_gasolina = calcular_porcentaje(datos_ultimo_anio['gasolina_min'], datos_anterior['gasolina_min'])
-    porcentaje_avg_gasolina = calcular_porcentaje(datos_ultimo_anio['gasolina_avg'], datos_anterior['gasolina_avg'])
-    porcentaje_avg_acpm = calcular_porcentaje(datos_ultimo_anio['acpm_avg'], datos_anterior['acpm_avg'])
-
+    # Se evalúa en cada carga de página y no lee datos: los KPI y la tabla
+    # se completan con callbacks (app.py) sobre el dataset en caché compartido
     layout = dbc.Container(
         [
+            dcc.Location(id='url'),
             html.H1("Análisis de Precios de Combustibles en Colombia", className="text-center my-4"),
-            dbc.Row([
-                create_kpi_card("Precio Máximo Gasolina MC", datos_ultimo_anio['gasolina_max'], porcentaje_max_gasolina),
-                create_kpi_card("Precio Mínimo Gasolina MC", datos_ultimo_anio['gasolina_min'], porcentaje_min_gasolina),
-                create_kpi_card("Precio Promedio Gasolina MC", datos_ultimo_anio['gasolina_avg'], porcentaje_avg_gasolina),
-                create_kpi_card("Precio Promedio ACPM", datos_ultimo_anio['acpm_avg'], porcentaje_avg_acpm)
-            ], justify="center"),
+            dbc.Row(id='kpi-row', justify="center"),
             
             # Segunda fila con DatePickerRange y gráficos
             dbc.Row([
@@ -56,13 +32,15 @@ def create_layout():
                     dcc.Graph(
                         id='fig1-graph',
                         config={'displayModeBar': False}  # Opcional: Ocultar la barra de herramientas
-                    )
+                    ),
+                    dcc.Store(id='fig1-rendered')  # Rango y versión que muestra el gráfico
                 ], lg=6, md=12, sm=12, xs=12, style={'marginTop': '20px', 'marginBottom': '20px'}),  # Márgenes
                 dbc.Col([
                     dcc.Graph(
                         id='fig2-graph',
                         config={'displayModeBar': False}  # Opcional: Ocultar la barra de herramientas
-                    )
+                    ),
+                    dcc.Store(id='fig2-rendered')  # Rango y versión que muestra el gráfico
                 ], lg=6, md=12, sm=12, xs=12, style={'marginTop': '20px', 'marginBottom': '20px'})  # Márgenes
             ], justify='center'),
 
@@ -71,13 +49,15 @@ def create_layout():
                     dcc.Graph(
                         id='fig3-graph',
                         config={'displayModeBar': False}  # Opcional: Ocultar la barra de herramientas
-                    )
+                    ),
+                    dcc.Store(id='fig3-rendered')  # Rango y versión que muestra el gráfico
                 ], lg=6, md=12, sm=12, xs=12, style={'marginTop': '20px', 'marginBottom': '20px'}),  # Márgenes
                 dbc.Col([
                     dcc.Graph(
                         id='fig4-graph',
                         config={'displayModeBar': False}  # Opcional: Ocultar la barra de herramientas
-                    )
+                    ),
+                    dcc.Store(id='fig4-rendered')  # Rango y versión que muestra el gráfico
                 ], lg=6, md=12, sm=12, xs=12, style={'marginTop': '20px', 'marginBottom': '20px'})  # Márgenes
             ], justify='center'),
 
@@ -93,6 +73,28 @@ def create_layout():
 
     return layout
 
+def build_kpi_cards(resumen_file):
+    df_anual = load_annual_data(resumen_file)
+
+    # Obtener el último año y datos para KPIs
+    ultimo_anio = df_anual['year'].max()
+    datos_ultimo_anio = df_anual[df_anual['year'] == ultimo_anio].iloc[0]
+    anio_anterior = ultimo_anio - 1
+    datos_anterior = df_anual[df_anual['year'] == anio_anterior].iloc[0]
+
+    # Calcular porcentajes para cada KPI
+    porcentaje_max_gasolina = calcular_porcentaje(datos_ultimo_anio['gasolina_max'], datos_anterior['gasolina_max'])
+    porcentaje_min_gasolina = calcular_porcentaje(datos_ultimo_anio['gasolina_min'], datos_anterior['gasolina_min'])
+    porcentaje_avg_gasolina = calcular_porcentaje(datos_ultimo_anio['gasolina_avg'], datos_anterior['gasolina_avg'])
+    porcentaje_avg_acpm = calcular_porcentaje(datos_ultimo_anio['acpm_avg'], datos_anterior['acpm_avg'])
+
+    return [
+        create_kpi_card("Precio Máximo Gasolina MC", datos_ultimo_anio['gasolina_max'], porcentaje_max_gasolina),
+        create_kpi_card("Precio Mínimo Gasolina MC", datos_ultimo_anio['gasolina_min'], porcentaje_min_gasolina),
+        create_kpi_card("Precio Promedio Gasolina MC", datos_ultimo_anio['gasolina_avg'], porcentaje_avg_gasolina),
+        create_kpi_card("Precio Promedio ACPM", datos_ultimo_anio['acpm_avg'], porcentaje_avg_acpm)
+    ]
+
 def create_kpi_card(title, value, percentage):
     return dbc.Col([
         dbc.Card([
@@ -113,15 +115,11 @@ def create_kpi_card(title, value, percentage):
     ], width=3, lg=3, md=6, sm=6, xs=12)
 
 def get_table():
-    
-    downloads_folder = "../Download"
-    df = load_data(downloads_folder)
-
-    # Convertir la fecha al formato deseado y extraer el año
-    df['year'] = pd.to_datetime(df['fecha']).dt.year
-    df = df.sort_values(by='year', ascending=False)  # Ordenar desde el año actual hacia el menor
 
+    # Filtrado, orden y paginación se resuelven en el servidor (callback update_table en app.py):
+    # el navegador solo recibe la página visible
     return DataTable(
+        id='precios-table',
         columns=[
             {"name": "No. (Ranking de ese año)", "id": "No."},
             {"name": "Ciudad", "id": "Ciudad"},
@@ -129,12 +127,16 @@ def get_table():
             "format": Format(symbol=Symbol.yes, precision=2)},
             {"name": "ACPM ($/gal)", "id": "ACPM ($/gal)", "type": "numeric", 
             "format": Format(symbol=Symbol.yes, precision=2)},
-            {"name": "Año", "id": "year"},
+            {"name": "Año", "id": "year", "type": "numeric"},
         ],
-        data=df.to_dict('records'),
-        filter_action='native',  # Permitir filtrado
-        sort_action='native',     # Permitir ordenamiento
-        page_action='native',     # Permitir paginación
+        data=[],
+        filter_action='custom',  # Permitir filtrado
+        filter_query='',
+        sort_action='custom',     # Permitir ordenamiento
+        sort_mode='multi',
+        sort_by=[],
+        page_action='custom',     # Permitir paginación
+        page_current=0,
         page_size=10,            # Número de filas por página
         style_table={'overflowX': 'auto'},
         style_cell={
@@ -0,0 +1,164 @@
+import re
+import math
+import threading
+import pandas as pd
+from data_loader import load_data_with_version, filter_date_range, get_sql_source
+
+# Expresión de un filtro de DataTable: "{columna} operador valor"
+FILTER_RE = re.compile(
+    r'^\{(?P<column>[^}]+)\}\s*'
+    r'(?P<operator>[si]?(?:contains|datestartswith|>=|<=|!=|=|<|>|eq|ne|lt|le|gt|ge))\s*'
+    r'(?P<value>.*)$'
+)
+OPERATOR_ALIASES = {'eq': '=', 'ne': '!=', 'lt': '<', 'le': '<=', 'gt': '>', 'ge': '>='}
+# Operadores de texto: su valor se usa tal como se escribió ("1" no es "1.0")
+TEXT_OPERATORS = ('contains', 'datestartswith')
+
+def split_filter_query(filter_query):
+    """Convierte el filter_query de DataTable en una lista de (columna, operador, valor, sensible a mayúsculas)."""
+    filters = []
+    for part in (filter_query or '').split(' && '):
+        match = FILTER_RE.match(part.strip())
+        if not match:
+            continue
+        operator = match.group('operator')
+        case_sensitive = not operator.startswith('i')
+        operator = operator[1:] if operator[0] in 'si' and operator[1:] else operator
+        operator = OPERATOR_ALIASES.get(operator, operator)
+
+        value = match.group('value').strip()
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in ('"', "'", '`'):
+            value = value[1:-1].replace('\\' + value[0], value[0])
+        elif operator not in TEXT_OPERATORS:
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+        filters.append((match.group('column'), operator, value, case_sensitive))
+    return filters
+
+def _year_start(year):
+    return pd.Timestamp(year=year, month=1, day=1)
+
+def _year_end(year):
+    return _year_start(year + 1) - pd.Timedelta(1, 'us')
+
+def _year_bounds(operator, year):
+    # Rango de fechas [inicio, fin] equivalente a un filtro numérico sobre el año
+    if operator == '=':
+        return (_year_start(int(year)), _year_end(int(year))) if year.is_integer() else (pd.Timestamp.max, pd.Timestamp.min)
+    if operator == '>':
+        return _year_start(math.floor(year) + 1), pd.Timestamp.max
+    if operator == '>=':
+        return _year_start(math.ceil(year)), pd.Timestamp.max
+    if operator == '<':
+        return pd.Timestamp.min, _year_end(math.ceil(year) - 1)
+    if operator == '<=':
+        return pd.Timestamp.min, _year_end(math.floor(year))
+    return None
+
+def _as_text(series):
+    # Texto de una columna para los filtros de texto: los números sin ceros finales
+    # (16259.0 -> "16259"), igual que en db_source.SqlSource
+    text = series.astype(str)
+    if pd.api.types.is_float_dtype(series):
+        text = text.str.replace(r'\.0$', '', regex=True)
+    return text
+
+def _apply_filter(df, column, operator, value, case_sensitive):
+    if column not in df.columns:
+        return df
+    series = df[column]
+    if operator in TEXT_OPERATORS:
+        text = _as_text(series)
+        if operator == 'datestartswith':
+            return df[text.str.startswith(str(value))]
+        return df[text.str.contains(str(value), case=case_sensitive, regex=False)]
+
+    if pd.api.types.is_numeric_dtype(series) and not isinstance(value, float):
+        # Texto comparado con una columna numérica: no hay coincidencias posibles salvo "!="
+        return df if operator == '!=' else df.iloc[0:0]
+    if not pd.api.types.is_numeric_dtype(series):
+        series = series.astype(str)
+        value = str(value) if not isinstance(value, float) or not value.is_integer() else str(int(value))
+        if not case_sensitive:
+            series, value = series.str.lower(), value.lower()
+
+    if operator == '=':
+        return df[series == value]
+    if operator == '!=':
+        return df[series != value]
+    if operator == '<':
+        return df[series < value]
+    if operator == '<=':
+        return df[series <= value]
+    if operator == '>':
+        return df[series > value]
+    if operator == '>=':
+        return df[series >= value]
+    return df
+
+def split_date_ranges(filters):
+    # Separa los filtros numéricos sobre el año (convertidos a rangos de fechas) del resto
+    date_ranges, remaining = [], []
+    for column, operator, value, case_sensitive in filters:
+        bounds = _year_bounds(operator, value) if column == 'year' and isinstance(value, float) else None
+        if bounds is None:
+            remaining.append((column, operator, value, case_sensitive))
+        else:
+            date_ranges.append(bounds)
+    return date_ranges, remaining
+
+# Tabla base (con la columna 'year') cacheada por versión del dataset
+_table_frames = {}
+_table_lock = threading.Lock()
+
+def get_table_frame(downloads_folder):
+    df, version = load_data_with_version(downloads_folder)
+    with _table_lock:
+        cached = _table_frames.get(downloads_folder)
+        if cached is None or cached[0] != version:
+            cached = (version, df.assign(year=df['fecha'].dt.year))
+            _table_frames[downloads_folder] = cached
+        return cached[1]
+
+def query_table(downloads_folder, page_current, page_size, sort_by, filter_query):
+    """
+    Devuelve (filas de la página pedida, cantidad de páginas) aplicando en el
+    servidor el filtro, el orden y la paginación de la DataTable. Los filtros
+    sobre el año se resuelven con búsqueda binaria sobre la fecha (la tabla
+    base está ordenada por fecha); los demás se aplican solo sobre ese tramo.
+    """
+    # 1. Filtros de año -> rangos de fechas
+    date_ranges, remaining = split_date_ranges(split_filter_query(filter_query))
+
+    # Con una base de datos, filtro, orden y paginación se resuelven en SQL
+    source = get_sql_source()
+    if source is not None:
+        return source.query_page(date_ranges, remaining, sort_by, page_current, page_size)
+
+    # Rangos de fechas por búsqueda binaria (la tabla base está ordenada por fecha)
+    df = get_table_frame(downloads_folder)
+    for bounds in date_ranges:
+        df = filter_date_range(df, *bounds)
+
+    # 2. Resto de filtros sobre las filas ya acotadas
+    for column, operator, value, case_sensitive in remaining:
+        df = _apply_filter(df, column, operator, value, case_sensitive)
+
+    # 3. Orden: por defecto del año más reciente al más antiguo (la base ya está ordenada por fecha)
+    if sort_by:
+        df = df.sort_values(
+            [col['column_id'] for col in sort_by],
+            ascending=[col['direction'] == 'asc' for col in sort_by],
+            kind='stable'
+        )
+    else:
+        df = df.iloc[::-1]
+
+    # 4. Paginación
+    page_size = page_size or 10
+    page_current = page_current or 0
+    page_count = max(1, math.ceil(len(df) / page_size))
+    page = df.iloc[page_current * page_size:(page_current + 1) * page_size]
+    return page.drop(columns=['fecha']).to_dict('records'), page_count
@@ -0,0 +1,8 @@
+# Punto de entrada para servidores WSGI con varios procesos, por ejemplo:
+#   gunicorn -c gunicorn.conf.py wsgi:server
+# (desde la carpeta App). Importar la aplicación no lee datos: cada proceso
+# mapea en memoria el almacén columnar (Download/combustibles.feather) la
+# primera vez que lo necesita, y todos comparten sus páginas.
+from app import app
+
+server = app.server
@@ -0,0 +1,158 @@
+# Benchmark de la lectura de datos y los gráficos del dashboard sobre carpetas Download sintéticas
+#
+# Uso (desde la carpeta App):
+#   python ../Benchmarks/bench_app.py --tables 50 200 1000 --cities 24
+#   python ../Benchmarks/bench_app.py --tables 1000 5000 --store --json resultados.jsonl
+#   python ../Benchmarks/bench_app.py --tables 1000 5000 --sqlite
+#
+# Para cada tamaño genera con el ETL (transform_data + save_to_csv) una
+# carpeta Download con N fechas de vigencia x M ciudades y mide load_data
+# (en frío y en caliente), los cuatro gráficos de update_graphs (sin caché y
+# desde la caché de figuras) y una página filtrada de la tabla. Sin --store se
+# elimina el almacén columnar y la aplicación lee los CSV. Con --sqlite se crea
+# la base SQLite local (db_source.build_sqlite) y los gráficos y la tabla se
+# leen con DATA_SOURCE=sqlite: el rango y los agregados se resuelven en SQL.
+import os
+import sys
+import argparse
+import tempfile
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'Pipe'))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'App'))
+
+import logging_config
+
+# Los logs de la generación no se mezclan con los del ETL
+logging_config.LOG_DIR = os.path.join(tempfile.gettempdir(), 'bench_app_logs')
+
+from synthetic_creg import generate_raw_data
+from harness import measure, Report
+from transform import transform_data
+from load import save_to_csv, STORE_FILE
+import data_loader
+import db_source
+import aggregates
+import table_query
+import app as dashboard
+from figure_cache import FigureCache
+
+FIGURES = ['fig1', 'fig2', 'fig3', 'fig4']
+
+
+def build_download_tree(folder, n_tables, n_cities, store):
+    transformed_data, year_data = transform_data(generate_raw_data(n_tables, n_cities))
+    save_to_csv(transformed_data, year_data, folder)
+    if not store:
+        os.remove(os.path.join(folder, STORE_FILE))
+
+
+def reset_caches():
+    # Estado de un proceso recién iniciado: sin dataset, agregados ni figuras en memoria
+    data_loader._loaders.clear()
+    db_source._sources.clear()
+    aggregates._aggregates.clear()
+    table_query._table_frames.clear()
+    dashboard.figure_cache = FigureCache(maxsize=dashboard.figure_cache.maxsize)
+
+
+def render_all(start_date, end_date):
+    return [dashboard.render_figure(name, start_date, end_date, None) for name in FIGURES]
+
+
+def bench_size(report, workdir, n_tables, n_cities, args):
+    size = f"{n_tables}x{n_cities}"
+    folder = os.path.join(workdir, f"Download_{size}")
+    build_download_tree(folder, n_tables, n_cities, args.store)
+    dashboard.DOWNLOADS_FOLDER = folder
+    if args.sqlite:
+        return bench_sqlite(report, folder, size, args)
+    # Bytes que lee la aplicación: el almacén columnar o los CSV por fecha
+    folder_bytes = sum(
+        entry.stat().st_size for entry in os.scandir(folder)
+        if (entry.name == STORE_FILE if args.store else entry.name.startswith('combustibles_'))
+    )
+    memory = not args.no_memory
+
+    def cold():
+        reset_caches()
+        return (folder,)
+
+    # Lectura del dataset: en frío (proceso nuevo) y en caliente (sin cambios en disco)
+    df, seconds, peak = measure(data_loader.load_data, setup=cold, repeat=args.repeat, memory=memory)
+    rows = len(df)
+    report.add('load_data (frío)', size, seconds, rows, folder_bytes, peak)
+    _, seconds, peak = measure(data_loader.load_data, folder, repeat=args.repeat, memory=memory)
+    report.add('load_data (caliente)', size, seconds, rows, 0, peak)
+
+    # Gráficos del rango completo: con el dataset ya leído pero sin agregados ni figuras en caché
+    start_date, end_date = df['fecha'].min(), df['fecha'].max()
+
+    def warm_dataset():
+        reset_caches()
+        data_loader.load_data(folder)
+        return (start_date, end_date)
+
+    _, seconds, peak = measure(render_all, setup=warm_dataset, repeat=args.repeat, memory=memory)
+    report.add('update_graphs (sin caché)', size, seconds, rows, 0, peak)
+    _, seconds, peak = measure(render_all, start_date, end_date, repeat=args.repeat, memory=memory)
+    report.add('update_graphs (caché)', size, seconds, rows, 0, peak)
+
+    # Una página de la tabla filtrada por año y ciudad
+    query = f"{{year}} = {end_date.year} && {{Ciudad}} contains Bog"
+    _, seconds, peak = measure(
+        table_query.query_table, folder, 0, 10, [], query, repeat=args.repeat, memory=memory
+    )
+    report.add('tabla (página filtrada)', size, seconds, rows, 0, peak)
+
+
+def bench_sqlite(report, folder, size, args):
+    db_path = os.path.join(folder, 'combustibles.db')
+    rows, _ = db_source.build_sqlite(folder, db_path)
+    os.environ['DATA_SOURCE'], os.environ['SQLITE_PATH'] = 'sqlite', db_path
+    memory = not args.no_memory
+    try:
+        source = data_loader.get_sql_source()
+        start_date, end_date = source.query(f"SELECT MIN(fecha), MAX(fecha) FROM {source.table}").iloc[0].map(pd.Timestamp)
+
+        # Sin datos en memoria: cada gráfico consulta su rango o sus agregados
+        _, seconds, peak = measure(render_all, setup=lambda: (reset_caches(), (start_date, end_date))[1],
+                                   repeat=args.repeat, memory=memory)
+        report.add('update_graphs (sin caché)', size, seconds, rows, os.path.getsize(db_path), peak)
+        _, seconds, peak = measure(render_all, start_date, end_date, repeat=args.repeat, memory=memory)
+        report.add('update_graphs (caché)', size, seconds, rows, 0, peak)
+
+        query = f"{{year}} = {end_date.year} && {{Ciudad}} contains Bog"
+        _, seconds, peak = measure(
+            table_query.query_table, folder, 0, 10, [], query, repeat=args.repeat, memory=memory
+        )
+        report.add('tabla (página filtrada)', size, seconds, rows, 0, peak)
+    finally:
+        os.environ['DATA_SOURCE'] = 'files'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide la lectura de datos y los gráficos sobre carpetas Download sintéticas.")
+    parser.add_argument('--tables', type=int, nargs='+', default=[50, 200, 1000], help="Fechas de vigencia (uno o más tamaños)")
+    parser.add_argument('--cities', type=int, default=24, help="Ciudades por fecha")
+    parser.add_argument('--store', action='store_true', help="Leer el almacén columnar en lugar de los CSV")
+    parser.add_argument('--sqlite', action='store_true', help="Leer los gráficos y la tabla desde una base SQLite (DATA_SOURCE=sqlite)")
+    parser.add_argument('--repeat', type=int, default=3, help="Repeticiones por medición (se informa la mejor)")
+    parser.add_argument('--no-memory', action='store_true', help="No medir el pico de memoria (evita una ejecución extra)")
+    parser.add_argument('--json', help="Agregar los resultados a este archivo (una línea JSON por ejecución)")
+    args = parser.parse_args()
+
+    source = 'SQLite' if args.sqlite else 'almacén columnar' if args.store else 'CSV'
+    report = Report(f"Dashboard sobre carpetas Download sintéticas ({args.cities} ciudades, {source})")
+    with tempfile.TemporaryDirectory() as workdir:
+        for n_tables in args.tables:
+            bench_size(report, workdir, n_tables, args.cities, args)
+
+    report.show()
+    if args.json:
+        report.save(args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+# Benchmark de extracción de tablas: análisis original vs. modo rápido
+#
+# Ambos modos registran las filas solo con nivel DEBUG y LOG_ROW_SAMPLE > 0, así que la
+# diferencia medida es la del analizador (html.parser con el árbol completo frente al
+# analizador rápido con SoupStrainer), no el costo del log por fila.
+#
+# Uso (desde la carpeta Pipe, con una copia guardada de la página de la CREG):
+#   python ../Benchmarks/bench_extract.py pagina_creg.html --repeat 5
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Pipe'))
+
+from extract import parse_tables, FAST_PARSER
+
+
+def time_parse(content, fast, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = parse_tables(content, fast=fast)
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara el análisis original de tablas con el modo rápido.")
+    parser.add_argument('html', help="Copia guardada de la página de precios de la CREG")
+    parser.add_argument('--repeat', type=int, default=5, help="Repeticiones por modo")
+    args = parser.parse_args()
+
+    with open(args.html, 'rb') as f:
+        content = f.read()
+
+    legacy_data, legacy_times = time_parse(content, fast=False, repeat=args.repeat)
+    fast_data, fast_times = time_parse(content, fast=True, repeat=args.repeat)
+
+    rows = sum(len(table['data']) for table in fast_data)
+    print(f"Página: {args.html} ({len(content) / 1024:.1f} KiB, {len(fast_data)} tablas, {rows} filas)")
+    print(f"Original (html.parser, árbol completo): mejor {min(legacy_times) * 1000:.1f} ms, media {sum(legacy_times) / len(legacy_times) * 1000:.1f} ms")
+    print(f"Rápido ({FAST_PARSER}, SoupStrainer):         mejor {min(fast_times) * 1000:.1f} ms, media {sum(fast_times) / len(fast_times) * 1000:.1f} ms")
+    print(f"Aceleración: {min(legacy_times) / min(fast_times):.2f}x")
+    print(f"Resultados idénticos: {legacy_data == fast_data}")
+
+
+if __name__ == '__main__':
+    main()
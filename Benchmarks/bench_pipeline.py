@@ -0,0 +1,153 @@
+# Benchmark del ETL completo sobre páginas sintéticas (sin acceso a creg.gov.co)
+#
+# Uso (desde la carpeta Pipe):
+#   python ../Benchmarks/bench_pipeline.py --tables 10 100 500 --cities 24
+#   python ../Benchmarks/bench_pipeline.py --tables 100 1000 --db --json resultados.jsonl
+#
+# Para cada tamaño genera una página con N tablas x M ciudades, la sirve con un
+# servidor HTTP local y mide extract_data, transform_data, save_to_csv y, con
+# --db, las cargas en PostgreSQL (configuración de config.py / .env) sobre
+# tablas temporales bench_* que se eliminan al terminar.
+import os
+import sys
+import copy
+import argparse
+import tempfile
+import threading
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Pipe'))
+
+import logging_config
+
+# Los logs del benchmark no se mezclan con los del ETL
+logging_config.LOG_DIR = os.path.join(tempfile.gettempdir(), 'bench_pipeline_logs')
+
+from synthetic_creg import generate_raw_data, render_page
+from harness import measure, Report
+from extract import extract_data
+from transform import transform_data
+from load import save_to_csv, save_to_postgresql_combustibles, save_to_postgresql_resumen_anual, db_transaction
+from config import get_db_config
+
+BENCH_TABLE = 'bench_precios_combustibles'
+BENCH_RESUMEN_TABLE = 'bench_resumen_combustibles_anuales'
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve_folder(folder):
+    # Servidor HTTP local en un puerto libre; devuelve (servidor, URL base)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(QuietHandler, directory=folder))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def create_bench_tables(config):
+    with db_transaction(config) as conn, conn.cursor() as cur:
+        cur.execute(f"""
+            DROP TABLE IF EXISTS {BENCH_TABLE}, {BENCH_RESUMEN_TABLE};
+            CREATE TABLE {BENCH_TABLE} (
+                id SERIAL PRIMARY KEY, numero INT, fecha DATE NOT NULL, ciudad VARCHAR(100) NOT NULL,
+                gasolina_mc DECIMAL(10, 2) NOT NULL, acpm DECIMAL(10, 2) NOT NULL,
+                CONSTRAINT {BENCH_TABLE}_uq UNIQUE (fecha, ciudad)
+            );
+            CREATE TABLE {BENCH_RESUMEN_TABLE} (
+                year INT PRIMARY KEY, max_gasolina_mc DECIMAL(10, 2), min_gasolina_mc DECIMAL(10, 2),
+                avg_gasolina_mc DECIMAL(10, 2), max_acpm DECIMAL(10, 2), min_acpm DECIMAL(10, 2), avg_acpm DECIMAL(10, 2)
+            );
+        """)
+
+
+def drop_bench_tables(config):
+    with db_transaction(config) as conn, conn.cursor() as cur:
+        cur.execute(f"DROP TABLE IF EXISTS {BENCH_TABLE}, {BENCH_RESUMEN_TABLE}")
+
+
+def load_combustibles(config, transformed_data):
+    with db_transaction(config) as conn:
+        save_to_postgresql_combustibles(transformed_data, config, BENCH_TABLE, conn=conn)
+
+
+def load_resumen(config, year_data):
+    with db_transaction(config) as conn:
+        save_to_postgresql_resumen_anual(year_data, config, BENCH_RESUMEN_TABLE, conn=conn)
+
+
+def bench_size(report, workdir, base_url, n_tables, n_cities, args, config):
+    size = f"{n_tables}x{n_cities}"
+    expected = generate_raw_data(n_tables, n_cities)
+    page_name = f"pagina_{size}.html"
+    with open(os.path.join(workdir, page_name), 'w', encoding='utf-8') as f:
+        f.write(render_page(expected))
+    page_bytes = os.path.getsize(os.path.join(workdir, page_name))
+    rows = n_tables * n_cities
+    memory = not args.no_memory
+
+    # Extracción (descarga desde el servidor local + análisis)
+    cache_dir = os.path.join(workdir, 'Cache')
+    raw_data, seconds, peak = measure(
+        extract_data, f"{base_url}/{page_name}", cache_dir=cache_dir,
+        repeat=args.repeat, memory=memory
+    )
+    if raw_data != expected:
+        raise RuntimeError(f"La extracción de {size} no coincide con las tablas generadas")
+    report.add('extract_data', size, seconds, rows, page_bytes, peak)
+
+    # Transformación (transform_table modifica las fechas: cada ejecución recibe una copia)
+    (transformed_data, year_data), seconds, peak = measure(
+        transform_data, setup=lambda: (copy.deepcopy(raw_data),), repeat=args.repeat, memory=memory
+    )
+    report.add('transform_data', size, seconds, rows, 0, peak)
+
+    # CSV por fecha, almacén columnar y resumen anual
+    output_dir = os.path.join(workdir, f"Download_{size}")
+    _, seconds, peak = measure(
+        save_to_csv, transformed_data, year_data, output_dir, repeat=args.repeat, memory=memory
+    )
+    csv_bytes = sum(entry.stat().st_size for entry in os.scandir(output_dir))
+    report.add('save_to_csv', size, seconds, rows, csv_bytes, peak)
+
+    if config is not None:
+        _, seconds, peak = measure(load_combustibles, config, transformed_data, repeat=args.repeat, memory=memory)
+        report.add('postgres combustibles', size, seconds, rows, 0, peak)
+        _, seconds, peak = measure(load_resumen, config, year_data, repeat=args.repeat, memory=memory)
+        report.add('postgres resumen_anual', size, seconds, len(year_data), 0, peak)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide el ETL sobre páginas sintéticas de la CREG.")
+    parser.add_argument('--tables', type=int, nargs='+', default=[10, 100, 500], help="Tablas por página (uno o más tamaños)")
+    parser.add_argument('--cities', type=int, default=24, help="Ciudades por tabla")
+    parser.add_argument('--repeat', type=int, default=3, help="Repeticiones por etapa (se informa la mejor)")
+    parser.add_argument('--db', action='store_true', help="Medir también la carga en PostgreSQL")
+    parser.add_argument('--no-memory', action='store_true', help="No medir el pico de memoria (evita una ejecución extra)")
+    parser.add_argument('--json', help="Agregar los resultados a este archivo (una línea JSON por ejecución)")
+    args = parser.parse_args()
+
+    config = get_db_config() if args.db else None
+    report = Report(f"ETL sobre páginas sintéticas ({args.cities} ciudades por tabla)")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        server, base_url = serve_folder(workdir)
+        try:
+            if config is not None:
+                create_bench_tables(config)
+            for n_tables in args.tables:
+                bench_size(report, workdir, base_url, n_tables, args.cities, args, config)
+        finally:
+            server.shutdown()
+            if config is not None:
+                drop_bench_tables(config)
+
+    report.show()
+    if args.json:
+        report.save(args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+# Corpus de variantes de caption de las tablas de la CREG y su fecha esperada
+#
+# Uso (desde la carpeta Pipe):
+#   python ../Benchmarks/caption_corpus.py --repeat 2000
+# Verifica que extract_date_from_caption reconozca cada variante y mide el
+# tiempo por caption con la caché de resultados fría y caliente.
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Pipe'))
+
+from extract import extract_date_from_caption, _parse_caption_date
+
+CAPTION_CORPUS = [
+    ("Precios de combustibles líquidos - Vigencia de 22 de marzo de 2025", '2025-03-22'),
+    ("Precios de referencia Vigencia de 7 de noviembre de 2024", '2024-11-07'),
+    ("Vigencia 1 de enero de 2023", '2023-01-01'),
+    ("Vigencia 01 del febrero del 2023", '2023-02-01'),
+    ("Precios máximos de venta al público a partir del 3 de mayo de 2023", '2023-05-03'),
+    ("Precios a partir del 12 de marzo de 2022", '2022-03-12'),
+    ("Vigencia de julio de 2022", '2022-07-01'),
+    ("Vigencia de diciembre del 2022", '2022-12-01'),
+    ("Vigencia\xa0de\xa017\xa0de\xa0octubre\xa0de\xa02024", '2024-10-17'),
+    ("  VIGENCIA DE 31 DE AGOSTO DE 2024  ", '2024-08-31'),
+    ("Vigencia de 2 de setiembre de 2023", '2023-09-02'),
+    ("Vigencia de 7 de septiembre de 2024", '2024-09-07'),
+    ("Vigencia de 13 de abr. de 2024", '2024-04-13'),
+    ("Vigencia 26 de jun de 2024", '2024-06-26'),
+    ("Vigencia 1° de dic de 2024", '2024-12-01'),
+    ("Vigencia de 24 de Febréro de 2024", '2024-02-24'),
+    ("Vigéncia de 4 de noviembre de 2023", '2023-11-04'),
+    ("Vigencia de sept. de 2023", '2023-09-01'),
+    ("Tabla de precios sin fecha de vigencia", None),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica y mide el reconocimiento de fechas en captions.")
+    parser.add_argument('--repeat', type=int, default=1000, help="Repeticiones sobre el corpus")
+    args = parser.parse_args()
+
+    failures = [
+        (caption, expected, extract_date_from_caption(caption))
+        for caption, expected in CAPTION_CORPUS
+        if extract_date_from_caption(caption) != expected
+    ]
+    for caption, expected, got in failures:
+        print(f"FALLA: {caption!r}: se esperaba {expected}, se obtuvo {got}")
+    print(f"Captions reconocidos correctamente: {len(CAPTION_CORPUS) - len(failures)}/{len(CAPTION_CORPUS)}")
+
+    captions = [caption for caption, _ in CAPTION_CORPUS]
+    total = args.repeat * len(captions)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        _parse_caption_date.cache_clear()
+        for caption in captions:
+            extract_date_from_caption(caption)
+    cold = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for caption in captions:
+            extract_date_from_caption(caption)
+    warm = time.perf_counter() - start
+
+    print(f"Caché fría:     {cold / total * 1e6:.2f} µs por caption")
+    print(f"Caché caliente: {warm / total * 1e6:.2f} µs por caption")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
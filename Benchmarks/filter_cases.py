@@ -0,0 +1,133 @@
+# Casos de filtro de la tabla de precios que deben dar el mismo resultado en memoria y en SQL
+#
+# Uso (desde la carpeta App):
+#   python ../Benchmarks/filter_cases.py
+#   python ../Benchmarks/filter_cases.py --postgres   # también contra PostgreSQL (variables DB_*)
+#
+# Genera con el ETL una carpeta Download sintética (60 fechas x 24 ciudades), la
+# copia a una base SQLite (y, con --postgres, a tablas temporales bench_*) y
+# ejecuta cada caso con query_table: con DATA_SOURCE=files (table_query, pandas)
+# y con la base de datos (db_source, SQL). Todas las filas, en orden, deben
+# coincidir, y la cantidad de filas debe ser la esperada cuando se indica.
+import os
+import sys
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'Pipe'))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'App'))
+
+import logging_config
+
+logging_config.LOG_DIR = os.path.join(tempfile.gettempdir(), 'filter_cases_logs')
+
+from synthetic_creg import generate_raw_data
+from transform import transform_data
+from load import save_to_csv
+import db_source
+import table_query
+
+N_TABLES, N_CITIES = 60, 24
+PRICE = 'Gasolina MC ($/gal)'
+
+# (filter_query, sort_by, filas esperadas o None si solo se compara entre orígenes)
+FILTER_CASES = [
+    ("", [], N_TABLES * N_CITIES),
+    # "No." no tiene tipo: su filtro por defecto en la DataTable es "contains"
+    ("{No.} contains 1", [], N_TABLES * 12),       # 1, 10-19 y 21
+    ("{No.} = 1", [], N_TABLES),
+    ("{No.} datestartswith 2", [], N_TABLES * 6),  # 2 y 20-24
+    ("{No.} > 20", [{'column_id': 'No.', 'direction': 'asc'}], N_TABLES * 4),
+    ("{No.} = abc", [], 0),
+    ("{No.} != abc", [], N_TABLES * N_CITIES),
+    ("{Ciudad} contains Bog", [], N_TABLES),
+    ("{Ciudad} contains bog", [], 0),
+    ("{Ciudad} icontains bog", [], N_TABLES),
+    ('{Ciudad} = "Santa Marta"', [], N_TABLES),
+    ("{Ciudad} datestartswith Ca", [], N_TABLES * 2),  # Cali y Cartagena
+    ("{year} = 2024", [{'column_id': 'Ciudad', 'direction': 'desc'}], None),
+    ("{year} >= 2023 && {Ciudad} icontains a", [{'column_id': PRICE, 'direction': 'desc'}], None),
+    ("{year} = 2023.5", [], 0),
+    (f"{{{PRICE}}} > 15000", [{'column_id': 'year', 'direction': 'asc'}, {'column_id': 'Ciudad', 'direction': 'asc'}], None),
+    (f"{{{PRICE}}} contains 5", [], None),
+    (f"{{{PRICE}}} datestartswith 16", [], None),
+]
+
+
+def run_case(folder, filter_query, sort_by):
+    # Todas las filas en una sola página, para comparar el resultado completo
+    records, _ = table_query.query_table(folder, 0, N_TABLES * N_CITIES, sort_by, filter_query)
+    return records
+
+
+def same_rows(expected, got):
+    if len(expected) != len(got):
+        return False
+    for a, b in zip(expected, got):
+        for key, value in a.items():
+            other = b.get(key)
+            if isinstance(value, float) or isinstance(other, float):
+                if abs(float(value) - float(other)) > 1e-6:
+                    return False
+            elif value != other:
+                return False
+    return True
+
+
+def load_postgres(transformed_data, year_data):
+    from load import db_transaction, save_to_postgresql_combustibles, save_to_postgresql_resumen_anual
+    sys.path.insert(0, BENCH_DIR)
+    from bench_pipeline import create_bench_tables, BENCH_TABLE, BENCH_RESUMEN_TABLE
+    from config import get_db_config
+
+    config = get_db_config()
+    create_bench_tables(config)
+    with db_transaction(config) as conn:
+        save_to_postgresql_combustibles(transformed_data, config, BENCH_TABLE, conn=conn)
+        save_to_postgresql_resumen_anual(year_data, config, BENCH_RESUMEN_TABLE, conn=conn)
+    return config, BENCH_TABLE, BENCH_RESUMEN_TABLE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica que los filtros de la tabla den lo mismo en memoria y en SQL.")
+    parser.add_argument('--postgres', action='store_true', help="Comparar también contra PostgreSQL (tablas temporales bench_*)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        transformed_data, year_data = transform_data(generate_raw_data(N_TABLES, N_CITIES))
+        save_to_csv(transformed_data, year_data, folder)
+        db_path = os.path.join(folder, 'combustibles.db')
+        db_source.build_sqlite(folder, db_path)
+
+        sources = {'sqlite': db_source.SqlSource('sqlite', db_path)}
+        if args.postgres:
+            config, table, resumen_table = load_postgres(transformed_data, year_data)
+            sources['postgres'] = db_source.SqlSource('postgres', config, table, resumen_table)
+
+        failures = 0
+        os.environ['DATA_SOURCE'] = 'files'
+        for filter_query, sort_by, expected_rows in FILTER_CASES:
+            expected = run_case(folder, filter_query, sort_by)
+            if expected_rows is not None and len(expected) != expected_rows:
+                failures += 1
+                print(f"FALLA (files): {filter_query!r}: {len(expected)} filas, se esperaban {expected_rows}")
+            for name, source in sources.items():
+                date_ranges, remaining = table_query.split_date_ranges(table_query.split_filter_query(filter_query))
+                got, _ = source.query_page(date_ranges, remaining, sort_by, 0, N_TABLES * N_CITIES)
+                if not same_rows(expected, got):
+                    failures += 1
+                    print(f"FALLA ({name}): {filter_query!r}: {len(got)} filas, en memoria {len(expected)}")
+
+        if args.postgres:
+            from bench_pipeline import drop_bench_tables
+            sources['postgres'].close()
+            drop_bench_tables(config)
+
+    total = len(FILTER_CASES) * (1 + len(sources))
+    print(f"Casos de filtro correctos: {total - failures}/{total} ({', '.join(['files'] + list(sources))})")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
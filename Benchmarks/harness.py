@@ -0,0 +1,70 @@
+# Utilidades comunes de los benchmarks: medición de tiempo y memoria, y reporte
+import gc
+import json
+import time
+import tracemalloc
+
+
+def measure(func, *args, repeat=1, memory=True, setup=None, **kwargs):
+    """
+    Ejecuta func(*args, **kwargs) `repeat` veces y devuelve (resultado, mejor
+    tiempo en segundos, pico de memoria en bytes). El pico se mide con
+    tracemalloc en una ejecución aparte, para que su sobrecosto no altere el
+    tiempo. `setup` (opcional) se llama antes de cada ejecución, fuera de la
+    medición, y su resultado reemplaza a `args`.
+    """
+    result = None
+    best = None
+    for _ in range(repeat):
+        call_args = setup() if setup else args
+        gc.collect()
+        start = time.perf_counter()
+        result = func(*call_args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    peak = None
+    if memory:
+        call_args = setup() if setup else args
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func(*call_args, **kwargs)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, best, peak
+
+
+class Report:
+    """Resultados por etapa y tamaño, con filas/s y MiB/s, impresos como tabla y opcionalmente en JSON."""
+
+    def __init__(self, title):
+        self.title = title
+        self.results = []
+
+    def add(self, stage, size, seconds, rows=0, nbytes=0, peak=None):
+        self.results.append({
+            'stage': stage,
+            'size': size,
+            'seconds': seconds,
+            'rows': rows,
+            'rows_per_second': rows / seconds if rows and seconds else None,
+            'bytes': nbytes,
+            'mib_per_second': nbytes / seconds / 2**20 if nbytes and seconds else None,
+            'peak_mib': peak / 2**20 if peak is not None else None
+        })
+
+    def show(self):
+        print(f"\n{self.title}")
+        print(f"{'etapa':<26}{'tamaño':>16}{'ms':>12}{'filas':>10}{'filas/s':>14}{'MiB/s':>10}{'pico MiB':>10}")
+        for r in self.results:
+            rate = f"{r['rows_per_second']:,.0f}" if r['rows_per_second'] else '-'
+            throughput = f"{r['mib_per_second']:.1f}" if r['mib_per_second'] else '-'
+            peak = f"{r['peak_mib']:.1f}" if r['peak_mib'] is not None else '-'
+            print(f"{r['stage']:<26}{r['size']:>16}{r['seconds'] * 1000:>12.1f}{r['rows']:>10}{rate:>14}{throughput:>10}{peak:>10}")
+
+    def save(self, path):
+        # Se agrega al archivo para comparar resultados entre cambios
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'title': self.title, 'time': time.time(), 'results': self.results}, ensure_ascii=False) + '\n')
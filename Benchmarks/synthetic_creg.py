@@ -0,0 +1,97 @@
+# Generador de páginas sintéticas con el formato de la publicación de la CREG
+#
+# Cada tabla tiene un caption "Precios Vigencia de <día> de <mes> de <año>",
+# encabezados No./Ciudad/Gasolina MC ($/gal)/ACPM ($/gal), una fila por ciudad
+# y la fila "Promedio PVP precio" que la extracción descarta. Sirve para medir
+# el ETL sin depender de creg.gov.co.
+#
+# Uso:
+#   python synthetic_creg.py --tables 200 --cities 24 -o pagina_sintetica.html
+import random
+import argparse
+from datetime import date, timedelta
+
+HEADERS = ['No.', 'Ciudad', 'Gasolina MC ($/gal)', 'ACPM ($/gal)']
+
+CITIES = [
+    'Bogotá', 'Medellín', 'Cali', 'Barranquilla', 'Cartagena', 'Bucaramanga', 'Pereira', 'Manizales',
+    'Ibagué', 'Villavicencio', 'Neiva', 'Pasto', 'Montería', 'Cúcuta', 'Armenia', 'Tunja',
+    'Popayán', 'Valledupar', 'Santa Marta', 'Sincelejo', 'Riohacha', 'Quibdó', 'Florencia', 'Yopal'
+]
+
+MONTHS = [
+    'enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio',
+    'julio', 'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre'
+]
+
+def city_names(n_cities):
+    # Ciudades reales primero y, si se piden más, nombres sintéticos
+    return CITIES[:n_cities] + [f"Ciudad {i}" for i in range(len(CITIES) + 1, n_cities + 1)]
+
+def vigencia_dates(n_tables, last=date(2025, 3, 1), step_days=14):
+    # Fechas de vigencia de la más reciente a la más antigua, como en la página publicada
+    return [last - timedelta(days=step_days * i) for i in range(n_tables)]
+
+def generate_raw_data(n_tables, n_cities, seed=0):
+    """
+    Tablas con la misma forma que devuelve extract_data ({'date', 'headers',
+    'data'}, con los valores como texto), para `n_tables` fechas de vigencia
+    y `n_cities` ciudades.
+    """
+    rng = random.Random(seed)
+    cities = city_names(n_cities)
+    offsets = [rng.uniform(-800, 800) for _ in cities]
+
+    raw_data = []
+    for k, vigencia in enumerate(vigencia_dates(n_tables)):
+        # Precios que suben hacia las fechas recientes, con variación por ciudad
+        gasolina_base = 16000 - 12 * k
+        acpm_base = 10800 - 8 * k
+        data = []
+        for i, city in enumerate(cities):
+            gasolina = gasolina_base + offsets[i] + rng.uniform(-50, 50)
+            acpm = acpm_base + offsets[i] * 0.6 + rng.uniform(-50, 50)
+            data.append([str(i + 1), city, f"{gasolina:.2f}", f"{acpm:.2f}"])
+        raw_data.append({'date': vigencia.isoformat(), 'headers': list(HEADERS), 'data': data})
+    return raw_data
+
+def caption_for(iso_date):
+    vigencia = date.fromisoformat(iso_date)
+    return f"Precios Vigencia de {vigencia.day} de {MONTHS[vigencia.month - 1]} de {vigencia.year}"
+
+def render_page(raw_data):
+    # HTML de la página: una tabla con caption por fecha, más contenido que la extracción ignora
+    parts = ['<html><head><title>Precios de combustibles líquidos</title></head><body>',
+             '<div class="menu"><a href="/">Inicio</a><p>Publicaciones de precios</p></div>']
+    header_html = ''.join(f"<th>{header}</th>" for header in HEADERS)
+    for table in raw_data:
+        rows = ''.join(
+            '<tr>' + ''.join(f"<td>{value}</td>" for value in row) + '</tr>'
+            for row in table['data']
+        )
+        average = '<tr><td></td><td>Promedio PVP precio</td><td>0</td><td>0</td></tr>'
+        parts.append(
+            f"<table><caption>{caption_for(table['date'])}</caption>"
+            f"<thead><tr>{header_html}</tr></thead><tbody>{rows}{average}</tbody></table>"
+        )
+    parts.append('<table><tr><td>Tabla sin caption</td></tr></table></body></html>')
+    return ''.join(parts)
+
+def generate_page(n_tables, n_cities, seed=0):
+    return render_page(generate_raw_data(n_tables, n_cities, seed))
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera una página sintética con tablas de precios de la CREG.")
+    parser.add_argument('--tables', type=int, default=100, help="Cantidad de tablas (fechas de vigencia)")
+    parser.add_argument('--cities', type=int, default=24, help="Cantidad de ciudades por tabla")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', default='pagina_sintetica.html')
+    args = parser.parse_args()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(generate_page(args.tables, args.cities, args.seed))
+    print(f"Página generada: {args.output} ({args.tables} tablas x {args.cities} ciudades)")
+
+
+if __name__ == '__main__':
+    main()
@@ -17,4 +17,10 @@ def get_db_config():
         'user': os.getenv('DB_USER'),
         'password': os.getenv('DB_PASSWORD'),
         'port': int(os.getenv('DB_PORT', 5432))  # Asume 5432 como puerto por defecto si no se especifica
-    }
\ No newline at end of file
+    }
+
+# PostgreSQL es opcional: la carga en la base de datos solo se hace si hay un servidor
+# o una base configurados (DB_HOST o DB_NAME); en otro caso el ETL solo escribe archivos
+def db_configured(db_config=None):
+    db_config = db_config or get_db_config()
+    return bool(db_config.get('host') or db_config.get('dbname'))
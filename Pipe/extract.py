@@ -1,134 +1,445 @@
 # extract_data.py
 import requests
-from bs4 import BeautifulSoup
-import logging
+from bs4 import BeautifulSoup, SoupStrainer
+import logging_config
+from logging_config import get_logger, row_detail_enabled, sample_row
+from metrics import stage, count, start_run, end_run, merge_stages
 import os
 import re
+import json
+import hashlib
+import unicodedata
+from functools import lru_cache
+from multiprocessing import get_context
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
 
-# Crear el directorio de logs si no existe
-os.makedirs('Logs', exist_ok=True)
+# Logging asíncrono y por etapa (ver logging_config.py)
+logger = get_logger('extract')
 
-# Configuración de logging en UTF-8 y en español
-logging.basicConfig(
-    filename='Logs/extraction_log.txt',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    encoding='utf-8'
+# Usar lxml como analizador HTML si está instalado (mucho más rápido que html.parser)
+try:
+    import lxml  # noqa: F401
+    FAST_PARSER = 'lxml'
+except ImportError:
+    FAST_PARSER = 'html.parser'
+
+REQUEST_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Carpeta para la caché HTTP (cuerpo de la página, ETag, Last-Modified y hash)
+CACHE_DIR = 'Cache'
+
+# Mapeo de nombres de meses (completos y abreviados, sin tildes) a números
+MONTH_MAP = {
+    'enero': '01', 'febrero': '02', 'marzo': '03', 'abril': '04',
+    'mayo': '05', 'junio': '06', 'julio': '07', 'agosto': '08',
+    'septiembre': '09', 'setiembre': '09', 'octubre': '10',
+    'noviembre': '11', 'diciembre': '12',
+    'ene': '01', 'feb': '02', 'mar': '03', 'abr': '04', 'may': '05', 'jun': '06',
+    'jul': '07', 'ago': '08', 'sep': '09', 'sept': '09', 'set': '09',
+    'oct': '10', 'nov': '11', 'dic': '12'
+}
+
+# Expresión única, compilada una sola vez, que cubre las variantes de caption conocidas:
+# "Vigencia de 22 de marzo de 2025", "Vigencia 1 de enero de 2023",
+# "a partir del 3 de mayo de 2023", "Vigencia de julio de 2022", "Vigencia 1° de abr. de 2024"
+CAPTION_DATE_RE = re.compile(
+    r'(?:vigencia\s*(?:de\s*)?|a\s+partir\s+del?\s*)'
+    r'(?:(\d{1,2})\s*[°º]?\s*(?:de|del)\s*)?'
+    r'([a-zñ]+)\.?\s*(?:de|del)?\s*(\d{4})'
 )
 
+def _strip_accents(text):
+    return ''.join(
+        char for char in unicodedata.normalize('NFD', text)
+        if unicodedata.category(char) != 'Mn'
+    )
+
+@lru_cache(maxsize=4096)
+def _parse_caption_date(normalized_caption):
+    for match in CAPTION_DATE_RE.finditer(_strip_accents(normalized_caption).lower()):
+        day, month, year = match.groups()
+        month_num = MONTH_MAP.get(month)
+        if month_num:
+            return f"{year}-{month_num}-{(day or '01').zfill(2)}"
+    return None
+
 def extract_date_from_caption(caption_text):
-    logging.info(f"Procesando caption para extraer fecha: {caption_text}")
-    
     # Eliminar caracteres especiales invisibles y normalizar espacios
+    start = time.perf_counter()
     caption_text = ' '.join(caption_text.split())
 
-    # Expresiones regulares comunes de fechas en español
-    patterns = [
-        r'Vigencia\s*de\s*(\d{1,2})\s*(?:de|del)\s*([a-zA-Z]+)\s*(?:de|del)\s*(\d{4})',
-        r'Vigencia\s*(\d{1,2})\s*(?:de|del)\s*([a-zA-Z]+)\s*(?:de|del)\s*(\d{4})',
-        r'a partir del\s*(\d{1,2})\s*(?:de|del)\s*([a-zA-Z]+)\s*(?:de|del)\s*(\d{4})',
-        r'Vigencia\s*de\s*([a-zA-Z]+)\s*(?:de|del)\s*(\d{4})'
-    ]
+    date = _parse_caption_date(caption_text)
+    count('date_extraction', time.perf_counter() - start, tables=1)
+    if date is None:
+        logger.error("No se pudo extraer la fecha correctamente desde el caption: %s", caption_text)
+    else:
+        logger.debug("Fecha %s extraída del caption: %s", date, caption_text)
+    return date
 
+def _cache_paths(url, cache_dir):
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{key}.html"), os.path.join(cache_dir, f"{key}.json")
 
-    for pattern in patterns:
-        match = re.search(pattern, caption_text, re.IGNORECASE)
-        if match:
-            try:
-                groups = match.groups()
-                if len(groups) == 3:
-                    day, month, year = groups
-                elif len(groups) == 2:
-                    day = '01'
-                    month, year = groups
-                else:
-                    continue
+def _read_cache_meta(meta_path):
+    if not os.path.exists(meta_path):
+        return {}
+    with open(meta_path, encoding='utf-8') as f:
+        return json.load(f)
 
-                # Mapeo de nombres de meses a números
-                month_map = {
-                    'enero': '01', 'febrero': '02', 'marzo': '03', 'abril': '04',
-                    'mayo': '05', 'junio': '06', 'julio': '07', 'agosto': '08',
-                    'septiembre': '09', 'setiembre': '09', 'octubre': '10',
-                    'noviembre': '11', 'diciembre': '12'
-                }
-
-                month = month.lower()
-                if month in month_map:
-                    month_num = month_map[month]
-                    return f"{year}-{month_num}-{day.zfill(2)}"
-            except Exception as e:
-                logging.error(f"Error procesando fecha: {e}")
-    
-    logging.error(f"No se pudo extraer la fecha correctamente desde el caption: {caption_text}")
-    return None
+def _write_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
 
-def extract_data(url):
-    try:
-        logging.info("Iniciando la extracción de datos desde la URL: %s", url)
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(url, headers=headers)
-        logging.info(f"Código de estado HTTP: {response.status_code}")
+def fetch_page(url, headers, cache_dir=CACHE_DIR, session=None, timeout=None):
+    """
+    Descarga la página con una solicitud condicional (If-None-Match /
+    If-Modified-Since) usando la copia guardada en `cache_dir`. Si se indica
+    `session`, la solicitud reutiliza sus conexiones.
+    Devuelve (contenido, cambió), donde `cambió` es False si el servidor
+    respondió 304 o si el contenido coincide con el último procesado.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    body_path, meta_path = _cache_paths(url, cache_dir)
+    meta = _read_cache_meta(meta_path) if os.path.exists(body_path) else {}
+
+    request_headers = dict(headers)
+    if meta.get('etag'):
+        request_headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        request_headers['If-Modified-Since'] = meta['last_modified']
+
+    response = (session or requests).get(url, headers=request_headers, timeout=timeout)
+    logger.info("Código de estado HTTP: %s (%s)", response.status_code, url)
+
+    if response.status_code == 304:
+        with open(body_path, 'rb') as f:
+            content = f.read()
+    else:
         response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
+        content = response.content
+        meta.update({
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'sha256': hashlib.sha256(content).hexdigest()
+        })
+        _write_atomic(body_path, content)
+        _write_atomic(meta_path, json.dumps(meta, ensure_ascii=False, indent=2).encode('utf-8'))
 
-        tables = soup.find_all('table')
-        logging.info(f"Se encontraron {len(tables)} tablas.")
-        if not tables:
-            raise ValueError("No se encontraron tablas en la página web.")
+    # Solo se considera sin cambios si ese mismo contenido ya se procesó completo
+    changed = meta.get('sha256') != meta.get('processed_sha256')
+    return content, changed
 
-        raw_data = []
+def mark_page_processed(url, cache_dir=CACHE_DIR):
+    # Registrar que el contenido en caché ya pasó por todo el ETL
+    _, meta_path = _cache_paths(url, cache_dir)
+    meta = _read_cache_meta(meta_path)
+    if not meta:
+        return
+    meta['processed_sha256'] = meta.get('sha256')
+    _write_atomic(meta_path, json.dumps(meta, ensure_ascii=False, indent=2).encode('utf-8'))
 
-        for table in tables:
-            caption = table.find('caption')
-            if not caption:
-                continue
+def _parse_tables_legacy(content):
+    soup = BeautifulSoup(content, 'html.parser')
+
+    tables = soup.find_all('table')
+    logger.info("Se encontraron %d tablas.", len(tables))
+    if not tables:
+        raise ValueError("No se encontraron tablas en la página web.")
+
+    raw_data = []
+
+    for table in tables:
+        caption = table.find('caption')
+        if not caption:
+            continue
+
+        caption_text = caption.get_text().strip()
+        logger.debug("Texto del caption: %s", caption_text)
 
-            caption_text = caption.get_text().strip()
-            logging.info(f"Texto del caption: {caption_text}")
+        # Usar la función mejorada para extraer la fecha
+        date = extract_date_from_caption(caption_text)
+        if not date:
+            continue
 
-            # Usar la función mejorada para extraer la fecha
-            date = extract_date_from_caption(caption_text)
-            if not date:
+        headers = [th.text.strip() for th in table.find_all('th')]
+
+        # Detalle por fila solo con nivel DEBUG y LOG_ROW_SAMPLE > 0 (ver logging_config.py)
+        row_detail = row_detail_enabled(logger)
+
+        data = []
+        for row in table.find('tbody').find_all('tr'):
+            cols = [td.text.strip() for td in row.find_all('td')]
+            if row_detail and sample_row():
+                logger.debug("Fila de datos: %s", cols)
+
+            if len(cols) > 1 and "Promedio PVP precio" in cols[1]:
+                if row_detail:
+                    logger.debug("Fila eliminada debido a 'Promedio PVP precio': %s", cols)
                 continue
 
-            headers = [th.text.strip() for th in table.find_all('th')]
+            if cols:
+                data.append(cols)
 
-            data = []
-            for row in table.find('tbody').find_all('tr'):
-                cols = [td.text.strip() for td in row.find_all('td')]
-                logging.info(f"Fila de datos: {cols}")
+        raw_data.append({
+            'date': date,
+            'headers': headers,
+            'data': data
+        })
+    return raw_data
 
-                if len(cols) > 1 and "Promedio PVP precio" in cols[1]:
-                    logging.info(f"Fila eliminada debido a 'Promedio PVP precio': {cols}")
-                    continue
+def iter_tables(content):
+    """
+    Generador del modo rápido: entrega cada tabla con fecha de vigencia
+    ({'date', 'headers', 'data'}) apenas se extraen sus filas.
+    """
+    # Solo se construyen en el árbol los elementos <table>, con el analizador más rápido disponible.
+    # El árbol de todas las tablas de la página sigue en memoria; lo que se entrega por partes son las filas
+    soup = BeautifulSoup(content, FAST_PARSER, parse_only=SoupStrainer('table'))
+
+    tables = soup.find_all('table')
+    logger.info("Se encontraron %d tablas.", len(tables))
+    if not tables:
+        raise ValueError("No se encontraron tablas en la página web.")
 
-                if cols:
-                    data.append(cols)
+    dated_tables = 0
+    discarded = 0
 
-            raw_data.append({
-                'date': date,
-                'headers': headers,
-                'data': data
-            })
+    for table in tables:
+        caption = table.caption
+        if caption is None:
+            continue
 
-        logging.info("Datos extraídos exitosamente.")
+        date = extract_date_from_caption(caption.get_text().strip())
+        if not date:
+            continue
+
+        headers = [th.get_text().strip() for th in table.find_all('th')]
+
+        row_detail = row_detail_enabled(logger)
+
+        data = []
+        for row in table.tbody.find_all('tr'):
+            cols = [td.get_text().strip() for td in row.find_all('td')]
+            if not cols:
+                continue
+            if len(cols) > 1 and "Promedio PVP precio" in cols[1]:
+                discarded += 1
+                continue
+            if row_detail and sample_row():
+                logger.debug("Fila de datos (%s): %s", date, cols)
+            data.append(cols)
+
+        dated_tables += 1
+        yield {
+            'date': date,
+            'headers': headers,
+            'data': data
+        }
+
+    logger.info("Tablas con fecha de vigencia: %d (filas de promedio descartadas: %d)", dated_tables, discarded)
+
+def parse_tables(content, fast=True):
+    """
+    Extrae las tablas con caption de la página. El modo rápido (por defecto)
+    usa lxml si está instalado, construye solo los elementos <table> y no
+    registra cada fila en el log; fast=False conserva el análisis original.
+    """
+    if fast:
+        return list(iter_tables(content))
+    return _parse_tables_legacy(content)
+
+def extract_data(url, only_if_changed=False, cache_dir=CACHE_DIR, fast=True):
+    try:
+        logger.info("Iniciando la extracción de datos desde la URL: %s", url)
+        
+        with stage('fetch') as s:
+            content, changed = fetch_page(url, REQUEST_HEADERS, cache_dir)
+            s['bytes'] = len(content)
+        if only_if_changed and not changed:
+            logger.info("La página no cambió desde la última ejecución; se omite el análisis.")
+            return []
+
+        with stage('parse') as s:
+            raw_data = parse_tables(content, fast=fast)
+            s['tables'] = len(raw_data)
+            s['rows'] = sum(len(table['data']) for table in raw_data)
+        
+        logger.info("Datos extraídos exitosamente.")
         return raw_data
 
     except Exception as e:
-        logging.error("Error en la extracción de datos: %s", str(e))
+        logger.error("Error en la extracción de datos: %s", str(e))
         return None
 
+def iter_extract(url, only_if_changed=False, cache_dir=CACHE_DIR):
+    """
+    Versión en flujo de extract_data: descarga la página y entrega las tablas
+    una a una. No captura errores; el consumidor decide cómo manejarlos.
+    """
+    logger.info("Iniciando la extracción en flujo desde la URL: %s", url)
+
+    with stage('fetch') as s:
+        content, changed = fetch_page(url, REQUEST_HEADERS, cache_dir)
+        s['bytes'] = len(content)
+    if only_if_changed and not changed:
+        logger.info("La página no cambió desde la última ejecución; se omite el análisis.")
+        return
+
+    # El análisis se intercala con el procesamiento de cada tabla: se acumula solo el tiempo
+    # que tarda el generador en entregar cada una y se registra como la etapa 'parse'
+    seconds, tables, rows = 0.0, 0, 0
+    parsed = iter_tables(content)
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                table = next(parsed)
+            except StopIteration:
+                break
+            finally:
+                seconds += time.perf_counter() - start
+            tables += 1
+            rows += len(table['data'])
+            yield table
+    finally:
+        count('parse', seconds, tables=tables, rows=rows)
+
+class HostRateLimiter:
+    """Espacia las solicitudes a un mismo host en al menos `min_interval` segundos."""
+
+    def __init__(self, min_interval=1.0):
+        self.min_interval = min_interval
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def build_session(max_connections=4):
+    # Sesión HTTP compartida por todos los hilos, con un pool de conexiones por host
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_connections, pool_maxsize=max_connections)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def _is_retryable(error):
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status == 429 or status >= 500
+    return isinstance(error, requests.RequestException)
+
+def _fetch_with_retry(session, url, limiter, retries, backoff, cache_dir, timeout):
+    for attempt in range(retries + 1):
+        limiter.wait(url)
+        try:
+            with stage('fetch') as s:
+                content, _ = fetch_page(url, REQUEST_HEADERS, cache_dir, session=session, timeout=timeout)
+                s['bytes'] = len(content)
+            return content
+        except Exception as e:
+            if attempt == retries or not _is_retryable(e):
+                raise
+            delay = backoff * (2 ** attempt)
+            logger.warning("Error al descargar %s (intento %d de %d): %s. Reintento en %.1f s",
+                            url, attempt + 1, retries + 1, e, delay)
+            time.sleep(delay)
+
+# Inicializa cada proceso del pool de análisis con la carpeta de logs del proceso principal
+def _init_parse_worker(log_dir):
+    logging_config.setup_worker_logging(log_dir)
+
+# Analiza una página en el pool y devuelve también sus métricas (p. ej. la extracción
+# de fechas), que en otro proceso no llegan a la ejecución activa del principal
+def _parse_tables_worker(content):
+    run = start_run('parse_worker')
+    try:
+        tables = parse_tables(content)
+    finally:
+        end_run()
+    return tables, run.stages
+
+def extract_many(urls, max_workers=4, min_interval=1.0, retries=3, backoff=1.0,
+                 parse_workers=None, cache_dir=CACHE_DIR, timeout=30):
+    """
+    Extrae varias páginas (backfills, versiones archivadas o espejos de la
+    publicación de la CREG). Las descargas usan una sesión compartida, con a
+    lo sumo `max_workers` simultáneas, `min_interval` segundos entre
+    solicitudes al mismo host y reintentos con espera exponencial. El análisis
+    del HTML se reparte en un pool de procesos iniciados con spawn (no fork:
+    las descargas y el logging tienen hilos activos). Las tablas se combinan sin
+    duplicar fechas de vigencia: ante una fecha repetida gana la primera URL
+    de la lista. Devuelve None si no se pudo extraer ninguna página.
+    """
+    urls = list(dict.fromkeys(urls))
+    logger.info("Iniciando la extracción de %d páginas.", len(urls))
+
+    limiter = HostRateLimiter(min_interval)
+    parsed = {}
+    with build_session(max_workers) as session, \
+            ThreadPoolExecutor(max_workers=max_workers) as fetch_pool, \
+            ProcessPoolExecutor(max_workers=parse_workers, mp_context=get_context('spawn'),
+                                initializer=_init_parse_worker,
+                                initargs=(logging_config.LOG_DIR,)) as parse_pool:
+        fetches = {
+            fetch_pool.submit(_fetch_with_retry, session, url, limiter, retries, backoff, cache_dir, timeout): url
+            for url in urls
+        }
+        # Cada página se analiza en cuanto termina su descarga
+        for future in as_completed(fetches):
+            url = fetches[future]
+            try:
+                parsed[url] = parse_pool.submit(_parse_tables_worker, future.result())
+            except Exception as e:
+                logger.error("No se pudo descargar %s: %s", url, e)
+
+        # El análisis ocurre en otros procesos: se mide la espera de sus resultados
+        raw_data = {}
+        with stage('parse') as s:
+            for url in urls:
+                if url not in parsed:
+                    continue
+                try:
+                    tables, worker_stages = parsed[url].result()
+                except Exception as e:
+                    logger.error("No se pudo analizar %s: %s", url, e)
+                    del parsed[url]
+                    continue
+                merge_stages(worker_stages)
+                s['tables'] += len(tables)
+                s['rows'] += sum(len(table['data']) for table in tables)
+                for table in tables:
+                    raw_data.setdefault(table['date'], table)
+
+    if not parsed:
+        logger.error("No se pudo extraer ninguna de las %d páginas.", len(urls))
+        return None
+
+    logger.info("Extracción múltiple completada: %d páginas, %d tablas únicas.", len(parsed), len(raw_data))
+    return list(raw_data.values())
+
 if __name__ == "__main__":
     url = 'https://creg.gov.co/publicaciones/15565/precios-de-combustibles-liquidos/'
     raw_data = extract_data(url)
     
     if raw_data is not None:
-        logging.info("Muestra de los datos crudos extraídos: \n%s", raw_data[:2])
+        logger.debug("Muestra de los datos crudos extraídos: \n%s", raw_data[:2])
         print("Datos crudos extraídos:")
         print(raw_data[:2])
     else:
-        logging.error("No se pudieron obtener los datos crudos.")
+        logger.error("No se pudieron obtener los datos crudos.")
@@ -1,109 +1,429 @@
 import os
-import logging
+import re
+import gzip
+import hashlib
+import threading
+from logging_config import get_logger
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
 import pandas as pd
-import psycopg2
 from psycopg2 import sql
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from config import get_db_config
 
-# Crear el directorio de logs si no existe
-os.makedirs('Logs', exist_ok=True)
+# Logging asíncrono y por etapa (ver logging_config.py)
+logger = get_logger('load')
 
-# Configuración de logging
-logging.basicConfig(
-    filename='Logs/load_log.txt',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    encoding='utf-8'
-)
+# Almacén columnar consolidado (Feather/Arrow) que se mantiene junto a los CSV
+STORE_FILE = 'combustibles.feather'
+PRICE_COLUMNS = ['No.', 'Gasolina MC ($/gal)', 'ACPM ($/gal)']
+
+# CSV por fecha: compresión opcional ('gzip' -> combustibles_DD_MM_YYYY.csv.gz) e hilos de escritura
+CSV_COMPRESSION = os.getenv('CSV_COMPRESSION') or None
+CSV_WORKERS = int(os.getenv('CSV_WORKERS', 4))
+
+def _frame(headers, rows, dates):
+    df = pd.DataFrame(rows, columns=headers)
+    df['fecha'] = dates
+    return df
+
+# Construir un DataFrame tipado con todas las tablas transformadas (en su orden).
+# Las tablas consecutivas con los mismos encabezados (normalmente todas) se
+# convierten juntas, en lugar de crear un DataFrame por tabla.
+def build_typed_frame(transformed_data, parse_dates=True):
+    frames = []
+    headers, rows, dates = None, [], []
+    for table in transformed_data.values():
+        if headers is not None and table['headers'] != headers:
+            frames.append(_frame(headers, rows, dates))
+            rows, dates = [], []
+        headers = table['headers']
+        rows.extend(table['data'])
+        dates.extend([table['date']] * len(table['data']))
+    frames.append(_frame(headers, rows, dates))
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+    if parse_dates:
+        df['fecha'] = pd.to_datetime(df['fecha'], format='%d-%m-%Y', errors='coerce')
+    for column in PRICE_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df
+
+# Nombre de los CSV por fecha que escribe save_tables_to_csv
+CSV_NAME_RE = re.compile(r'^combustibles_(\d{2}_\d{2}_\d{4})\.csv(?:\.gz)?$')
+
+def _read_missing_csvs(output_dir, known_dates):
+    """
+    Lee los CSV por fecha de `output_dir` cuyas fechas no están en
+    `known_dates`, con los mismos tipos que build_typed_frame. Sirve para
+    crear el almacén con todo el histórico en disco (y completarlo si quedó
+    incompleto), no solo con las tablas de la ejecución actual.
+    """
+    frames = []
+    seen = set(known_dates)
+    for name in sorted(os.listdir(output_dir)):
+        match = CSV_NAME_RE.match(name)
+        if not match:
+            continue
+        fecha = pd.to_datetime(match.group(1), format='%d_%m_%Y')
+        if fecha in seen:
+            continue
+        seen.add(fecha)
+        df = pd.read_csv(os.path.join(output_dir, name))
+        df['fecha'] = pd.to_datetime(df['fecha'], format='%d-%m-%Y', errors='coerce')
+        for column in PRICE_COLUMNS:
+            if column in df.columns:
+                df[column] = pd.to_numeric(df[column], errors='coerce')
+        frames.append(df)
+    return frames
+
+# Agregar (o reemplazar por fecha) los datos en el almacén columnar de forma atómica.
+# Los errores se registran y se propagan: si el almacén no se actualiza, la carga no
+# debe darse por terminada (el manifiesto no avanza y las tablas se reprocesan).
+def save_to_store(transformed_data, output_dir='../Download'):
+    try:
+        if not transformed_data:
+            return
+        store_path = os.path.join(output_dir, STORE_FILE)
+        df = build_typed_frame(transformed_data)
+        new_dates = set(df['fecha'].dropna().unique())
+
+        frames = []
+        if os.path.exists(store_path):
+            existing = pd.read_feather(store_path)
+            existing['Ciudad'] = existing['Ciudad'].astype(str)
+            # Las fechas recién cargadas sustituyen a su versión anterior
+            existing = existing[~existing['fecha'].isin(new_dates)]
+            frames.append(existing)
+            known_dates = new_dates | set(existing['fecha'].dropna().unique())
+        else:
+            known_dates = new_dates
+
+        # Fechas que solo están en los CSV (almacén nuevo o incompleto)
+        history = _read_missing_csvs(output_dir, known_dates)
+        if history:
+            logger.info("Almacén columnar: %d fechas agregadas desde los CSV existentes", len(history))
+        df = pd.concat(frames + history + [df], ignore_index=True)
+
+        # Ciudades normalizadas y orden por fecha y ciudad (el que usa la aplicación): así la
+        # aplicación puede mapear el archivo en memoria y usarlo sin copiarlo ni reordenarlo
+        df['Ciudad'] = df['Ciudad'].astype(str).replace({'Bogotá D.C.': 'Bogotá'})
+        df = df.sort_values(by=['fecha', 'Ciudad'], kind='stable', na_position='last').reset_index(drop=True)
+        df['Ciudad'] = df['Ciudad'].astype('category')
+
+        # Escribir en un archivo temporal y reemplazar: los lectores nunca ven un archivo a medias
+        tmp_path = f"{store_path}.tmp"
+        # Un solo lote de registros: cada columna queda contigua y la aplicación la usa sin copiarla
+        df.to_feather(tmp_path, compression='uncompressed', chunksize=max(len(df), 1))
+        os.replace(tmp_path, store_path)
+        logger.info("Almacén columnar actualizado: %s (%d filas)", store_path, len(df))
+
+    except Exception as e:
+        logger.error("Error al guardar el almacén columnar: %s", e)
+        raise
+
+def csv_filename(date, output_dir='../Download', compression=None):
+    date_str = date.replace('-', '_')  # Para nombres de archivo seguros
+    suffix = '.csv.gz' if compression == 'gzip' else '.csv'
+    return os.path.join(output_dir, f"combustibles_{date_str}{suffix}")
+
+def _encode_csv(text, compression=None):
+    data = text.encode('utf-8-sig')
+    if compression == 'gzip':
+        # mtime=0: el mismo contenido produce siempre los mismos bytes (y el mismo hash)
+        data = gzip.compress(data, mtime=0)
+    return data
+
+def _render_tables(df, tables, bounds):
+    """
+    Texto CSV de cada tabla a partir del DataFrame tipado. Si todas las tablas
+    tienen los mismos encabezados, se genera el CSV completo con un solo
+    to_csv y se corta por tabla; si no (o si algún valor requirió comillas y
+    podría contener saltos de línea), se genera cada tramo por separado.
+    """
+    headers = tables[0]['headers']
+    columns = headers + ['fecha']
+    if all(table['headers'] == headers for table in tables) and list(df.columns) == columns:
+        body = df.to_csv(index=False, header=False, lineterminator='\n')
+        if '"' not in body:
+            # El encabezado pasa por el mismo escritor CSV que las filas (comillas si hacen falta)
+            header_line = df.iloc[:0].to_csv(index=False, lineterminator='\n')
+            lines = body.split('\n')
+            return [
+                header_line + ''.join(line + '\n' for line in lines[bounds[i]:bounds[i + 1]])
+                for i in range(len(tables))
+            ]
+
+    return [
+        df.iloc[bounds[i]:bounds[i + 1]][table['headers'] + ['fecha']].to_csv(index=False, lineterminator='\n')
+        for i, table in enumerate(tables)
+    ]
+
+# Escribir `data` en `path` de forma atómica, salvo que el archivo ya tenga el mismo contenido.
+# Devuelve True si escribió el archivo.
+def write_if_changed(path, data):
+    if os.path.exists(path) and os.path.getsize(path) == len(data):
+        with open(path, 'rb') as f:
+            if hashlib.sha256(f.read()).digest() == hashlib.sha256(data).digest():
+                return False
+
+    # Archivo temporal y reemplazo: la aplicación nunca lee un CSV a medias
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+def _write_table_csv(text, date, output_dir, compression):
+    path = csv_filename(date, output_dir, compression)
+    written = write_if_changed(path, _encode_csv(text, compression))
+
+    # Si cambió el formato, se elimina la versión anterior de la misma fecha
+    other = csv_filename(date, output_dir, None if compression == 'gzip' else 'gzip')
+    if os.path.exists(other):
+        os.remove(other)
+
+    if written:
+        logger.debug("Datos guardados en CSV: %s", path)
+    return written
+
+def save_tables_to_csv(transformed_data, output_dir='../Download', compression=CSV_COMPRESSION, max_workers=CSV_WORKERS):
+    """
+    Escribe el CSV de cada fecha. Los tipos se convierten una sola vez para
+    todas las tablas; cada archivo se codifica y se escribe en un pool de hilos,
+    de forma atómica, y se omite si su contenido no cambió (así tampoco
+    cambia su fecha de modificación y la aplicación no vuelve a leerlo).
+    Devuelve la cantidad de archivos escritos.
+    """
+    if not transformed_data:
+        return 0
+    tables = list(transformed_data.values())
+    df = build_typed_frame(transformed_data, parse_dates=False)
+    # 'No.' se escribe como entero (1, no 1.0) cuando todos sus valores lo son
+    if 'No.' in df.columns and df['No.'].dropna().mod(1).eq(0).all():
+        df['No.'] = df['No.'].astype('Int64')
+
+    # Cada tabla ocupa un tramo contiguo del DataFrame tipado (en el orden de transformed_data)
+    bounds = np.cumsum([0] + [len(table['data']) for table in tables])
+    texts = _render_tables(df, tables, bounds)
+
+    # Codificación, compresión, hash y escritura de cada archivo en el pool de hilos
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        written = sum(pool.map(
+            lambda item: _write_table_csv(item[0], item[1]['date'], output_dir, compression),
+            zip(texts, tables)
+        ))
+
+    logger.info("CSV por fecha: %d escritos, %d sin cambios", written, len(tables) - written)
+    return written
+
+# Guardar una tabla transformada en su CSV por fecha
+def save_table_to_csv(table, output_dir='../Download', compression=CSV_COMPRESSION):
+    return save_tables_to_csv({table['date']: table}, output_dir, compression, max_workers=1)
+
+# Guardar el resumen anual de los valores de combustibles
+def save_resumen_to_csv(resumen_data, output_dir='../Download'):
+    resumen_filename = f"{output_dir}/resumen_combustibles_anuales.csv"
+    resumen_df = pd.DataFrame(resumen_data)
+    write_if_changed(resumen_filename, _encode_csv(resumen_df.to_csv(index=False)))
+    logger.info("Resumen anual guardado en CSV: %s", resumen_filename)
 
 # Guardar los datos en archivos CSV
-def save_to_csv(transformed_data, resumen_data, output_dir='../Download'):
+def save_to_csv(transformed_data, resumen_data, output_dir='../Download', compression=CSV_COMPRESSION, max_workers=CSV_WORKERS):
     try:
         os.makedirs(output_dir, exist_ok=True)
         
         # Guardar los datos transformados (combustibles)
-        for date_str, table in transformed_data.items():
-            date_str = date_str.replace('-', '_')  # Para nombres de archivo seguros
-            filename = f"{output_dir}/combustibles_{date_str}.csv"
-            df = pd.DataFrame(table['data'], columns=table['headers'])
-            df['fecha'] = table['date']  # Agregar la fecha como columna
-            df.to_csv(filename, index=False, encoding='utf-8-sig')
-            logging.info(f"Datos guardados en CSV: {filename}")
+        save_tables_to_csv(transformed_data, output_dir, compression, max_workers)
+
+        # Mantener el almacén columnar consolidado junto a los CSV por fecha
+        save_to_store(transformed_data, output_dir)
 
         # Guardar el resumen anual de los valores de combustibles
-        resumen_filename = f"{output_dir}/resumen_combustibles_anuales.csv"
-        resumen_df = pd.DataFrame(resumen_data)
-        resumen_df.to_csv(resumen_filename, index=False, encoding='utf-8-sig')
-        logging.info(f"Resumen anual guardado en CSV: {resumen_filename}")
+        save_resumen_to_csv(resumen_data, output_dir)
+        return True
     
     except Exception as e:
-        logging.error(f"Error al guardar CSV: {e}")
+        logger.error("Error al guardar CSV: %s", e)
+        return False
+
+# Pools de conexiones compartidos por el proceso, uno por configuración de base de datos
+_pools = {}
+
+def get_connection_pool(db_config=None, minconn=1, maxconn=4):
+    db_config = db_config or get_db_config()
+    key = tuple(sorted(db_config.items()))
+    if key not in _pools:
+        _pools[key] = ThreadedConnectionPool(minconn, maxconn, **db_config)
+    return _pools[key]
+
+def close_connection_pools():
+    for pool in _pools.values():
+        pool.closeall()
+    _pools.clear()
+
+# Tomar una conexión del pool y ejecutar todo el bloque en una sola transacción:
+# se confirma si el bloque termina bien y se revierte si lanza una excepción
+@contextmanager
+def db_transaction(db_config=None):
+    pool = get_connection_pool(db_config)
+    conn = pool.getconn()
+    try:
+        with conn:
+            yield conn
+    finally:
+        pool.putconn(conn)
+
+def _write_combustibles(cur, transformed_data, table_name, page_size):
+    columns = ['numero', 'ciudad', 'gasolina_mc', 'acpm', 'fecha']
+    upsert_query = sql.SQL(
+        "INSERT INTO {} ({}) VALUES %s "
+        "ON CONFLICT (fecha, ciudad) DO UPDATE SET {}"
+    ).format(
+        sql.Identifier(table_name),
+        sql.SQL(', ').join(map(sql.Identifier, columns)),
+        sql.SQL(', ').join(
+            sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(column))
+            for column in columns if column not in ('fecha', 'ciudad')
+        )
+    ).as_string(cur)
+
+    total_rows = 0
+    for date_str, table in transformed_data.items():
+        df = pd.DataFrame(table['data'], columns=table['headers'])
+        # Agregar la fecha como columna (como fecha real, independiente del DateStyle del servidor)
+        df['fecha'] = datetime.strptime(date_str, '%d-%m-%Y').date()
+
+        # Cambiar nombre de columnas para referenciarlos a los de la tabla
+        df = df.rename(columns={"No.": "numero", "Ciudad": 'ciudad', 'Gasolina MC ($/gal)': 'gasolina_mc', 'ACPM ($/gal)': 'acpm'})
+
+        # Una misma sentencia no puede actualizar dos veces la misma (fecha, ciudad): se conserva
+        # la última fila, la que quedaría con el upsert. Los CSV y el almacén conservan todas
+        repeated = df.duplicated(subset=['fecha', 'ciudad'], keep='last')
+        if repeated.any():
+            logger.warning("Tabla %s: %d filas repetidas por (fecha, ciudad) reemplazadas por la última en PostgreSQL",
+                           date_str, int(repeated.sum()))
+            df = df[~repeated]
+
+        rows = list(df[columns].itertuples(index=False, name=None))
+        execute_values(cur, upsert_query, rows, page_size=page_size)
+        total_rows += len(rows)
+    return total_rows
+
+def _write_resumen_anual(cur, resumen_data, table_name):
+    columns = ['year', 'max_gasolina_mc', 'min_gasolina_mc', 'avg_gasolina_mc', 'max_acpm', 'min_acpm', 'avg_acpm']
+    upsert_query = sql.SQL(
+        "INSERT INTO {} ({}) VALUES %s "
+        "ON CONFLICT (year) DO UPDATE SET {}"
+    ).format(
+        sql.Identifier(table_name),
+        sql.SQL(', ').join(map(sql.Identifier, columns)),
+        sql.SQL(', ').join(
+            sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(column))
+            for column in columns[1:]
+        )
+    ).as_string(cur)
+
+    rows = [
+        (
+            row['year'],
+            row['gasolina_max'],
+            row['gasolina_min'],
+            row['gasolina_avg'],
+            row['acpm_max'],
+            row['acpm_min'],
+            row['acpm_avg']
+        )
+        for row in resumen_data
+    ]
+    if rows:
+        execute_values(cur, upsert_query, rows)
+    return len(rows)
 
 # Guardar los datos en PostgreSQL (Tabla de precios combustibles)
-def save_to_postgresql_combustibles(transformed_data, db_config, table_name='precios_combustibles'):
+# Cada fecha se envía en un único INSERT de varias filas y se fusiona con
+# ON CONFLICT (fecha, ciudad), por lo que volver a ejecutar el ETL no duplica registros.
+# Si se recibe `conn`, se escribe dentro de la transacción del llamador y los errores se propagan.
+def save_to_postgresql_combustibles(transformed_data, db_config, table_name='precios_combustibles', page_size=1000, conn=None):
     try:
-        conn = psycopg2.connect(**db_config)
-        cur = conn.cursor()
-        
-        for date_str, table in transformed_data.items():
-            df = pd.DataFrame(table['data'], columns=table['headers'])
-            df['fecha'] = date_str  # Agregar la fecha como columna
-
-            # Cambiar nombre de columnas para referenciarlos a los de la tabla
-            df = df.rename(columns={"No.": "numero", "Ciudad": 'ciudad', 'Gasolina MC ($/gal)': 'gasolina_mc', 'ACPM ($/gal)': 'acpm'})
-
-            for _, row in df.iterrows():
-                values = list(row.values)
-                columns = list(row.index)
-                
-                # Usar sql.Identifier para las columnas
-                insert_query = sql.SQL("INSERT INTO {} ({}) VALUES ({})").format(
-                    sql.Identifier(table_name),
-                    sql.SQL(', ').join(map(sql.Identifier, columns)),
-                    sql.SQL(', ').join(sql.Placeholder() * len(values))
-                )
-                
-                cur.execute(insert_query, values)
-        
-        conn.commit()
-        cur.close()
-        conn.close()
-        logging.info(f"Datos insertados en la tabla PostgreSQL: {table_name}")
+        if conn is not None:
+            with conn.cursor() as cur:
+                total_rows = _write_combustibles(cur, transformed_data, table_name, page_size)
+        else:
+            with db_transaction(db_config) as own_conn, own_conn.cursor() as cur:
+                total_rows = _write_combustibles(cur, transformed_data, table_name, page_size)
+        logger.info("Datos insertados en la tabla PostgreSQL: %s (%d filas, %d fechas)", table_name, total_rows, len(transformed_data))
     
     except Exception as e:
-        logging.error(f"Error al insertar en PostgreSQL: {e}")
+        logger.error("Error al insertar en PostgreSQL: %s", e)
+        if conn is not None:
+            raise
 
 
 # Guardar los valores agregados por año en PostgreSQL (Tabla resumen de combustibles anuales)
-def save_to_postgresql_resumen_anual(resumen_data, db_config, table_name='resumen_combustibles_anuales'):
+# El resumen se fusiona con ON CONFLICT (year) para que la carga pueda repetirse.
+def save_to_postgresql_resumen_anual(resumen_data, db_config, table_name='resumen_combustibles_anuales', conn=None):
     try:
-        conn = psycopg2.connect(**db_config)
-        cur = conn.cursor()
-        for row in resumen_data:
-            values = [
-                row['year'],
-                row['gasolina_max'], 
-                row['gasolina_min'], 
-                row['gasolina_avg'], 
-                row['acpm_max'], 
-                row['acpm_min'], 
-                row['acpm_avg']
-            ]
-            
-            insert_query = sql.SQL("""
-                INSERT INTO {} (year, max_gasolina_mc, min_gasolina_mc, avg_gasolina_mc, 
-                                max_acpm, min_acpm, avg_acpm)
-                VALUES ({})""").format(
-                sql.Identifier(table_name),
-                sql.SQL(', ').join(sql.Placeholder() * len(values))
-            )
-            cur.execute(insert_query, values)
-        conn.commit()
-        cur.close()
-        conn.close()
-        logging.info(f"Datos insertados en la tabla PostgreSQL: {table_name}")
+        if conn is not None:
+            with conn.cursor() as cur:
+                _write_resumen_anual(cur, resumen_data, table_name)
+        else:
+            with db_transaction(db_config) as own_conn, own_conn.cursor() as cur:
+                _write_resumen_anual(cur, resumen_data, table_name)
+        logger.info("Datos insertados en la tabla PostgreSQL: %s", table_name)
     except Exception as e:
-        logging.error(f"Error al insertar en PostgreSQL: {e}")
+        logger.error("Error al insertar en PostgreSQL: %s", e)
+        if conn is not None:
+            raise
+
+class StreamingSink:
+    """
+    Destino de la carga en flujo: recibe las tablas transformadas una a una y
+    las escribe de inmediato en su CSV y, si se indica `conn`, en PostgreSQL
+    dentro de la transacción del llamador. El almacén columnar se actualiza
+    por lotes de `store_batch_size` tablas para no reescribirlo en cada una.
+    Los errores se propagan para que el llamador revierta la transacción.
+    """
+
+    def __init__(self, output_dir='../Download', conn=None, table_name='precios_combustibles',
+                 resumen_table_name='resumen_combustibles_anuales', store_batch_size=50, page_size=1000):
+        self.output_dir = output_dir
+        self.conn = conn
+        self.table_name = table_name
+        self.resumen_table_name = resumen_table_name
+        self.store_batch_size = store_batch_size
+        self.page_size = page_size
+        self.tables_written = 0
+        self._store_batch = {}
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, table):
+        save_table_to_csv(table, self.output_dir)
+
+        if self.conn is not None:
+            with self.conn.cursor() as cur:
+                _write_combustibles(cur, {table['date']: table}, self.table_name, self.page_size)
+
+        self._store_batch[table['date']] = table
+        if len(self._store_batch) >= self.store_batch_size:
+            self.flush()
+        self.tables_written += 1
+
+    def flush(self):
+        if self._store_batch:
+            save_to_store(self._store_batch, self.output_dir)
+            self._store_batch = {}
+
+    def close(self, resumen_data):
+        self.flush()
+        save_resumen_to_csv(resumen_data, self.output_dir)
+        if self.conn is not None:
+            save_to_postgresql_resumen_anual(resumen_data, None, self.resumen_table_name, conn=self.conn)
+        logger.info("Carga en flujo finalizada: %d tablas escritas", self.tables_written)
 
 # Ejemplo de uso si se ejecuta directamente este archivo
 if __name__ == "__main__":
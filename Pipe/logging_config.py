@@ -0,0 +1,136 @@
+import os
+import atexit
+import queue
+import random
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+# Configuración central de logging del ETL.
+# Los módulos registran en el logger de su etapa ('pipe.extract', 'pipe.transform', ...)
+# a través de una cola: el hilo del ETL solo encola el registro y un hilo aparte
+# (QueueListener) lo formatea y lo escribe en el archivo de la etapa.
+
+LOG_DIR = 'Logs'
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Archivo de cada etapa
+STAGE_FILES = {
+    'extract': 'extraction_log.txt',
+    'transform': 'transform_log.txt',
+    'load': 'load_log.txt',
+    'main': 'main_log.txt',
+    'manifest': 'main_log.txt'
+}
+
+# Nivel general (LOG_LEVEL) y por etapa (LOG_LEVEL_EXTRACT, LOG_LEVEL_LOAD, ...)
+DEFAULT_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+
+# Fracción de filas que se registran en detalle (solo con nivel DEBUG): 0 = ninguna, 1 = todas
+ROW_SAMPLE_RATE = float(os.getenv('LOG_ROW_SAMPLE', 0))
+
+_lock = threading.Lock()
+_listener = None
+_queue_handler = None
+_file_handlers = []
+
+class _DeferredQueueHandler(QueueHandler):
+    # QueueHandler.prepare() formatea el registro (incluida la interpolación %) en el hilo que
+    # registra; aquí se encola tal cual y el hilo escritor hace todo el formato. La cola es
+    # del mismo proceso, así que no hace falta volverlo serializable. Los argumentos se
+    # interpolan después: no se deben registrar objetos que luego se modifiquen
+    def prepare(self, record):
+        return record
+
+def _stage_level(stage):
+    return getattr(logging, os.getenv(f'LOG_LEVEL_{stage.upper()}', DEFAULT_LEVEL).upper(), logging.INFO)
+
+class _StageFilter(logging.Filter):
+    # Deja pasar solo los registros de las etapas que escriben en este archivo
+    def __init__(self):
+        super().__init__()
+        self.stages = set()
+
+    def filter(self, record):
+        return record.name in self.stages
+
+def _build_file_handlers():
+    os.makedirs(LOG_DIR, exist_ok=True)
+    formatter = logging.Formatter(LOG_FORMAT)
+    handlers = {}
+    for stage, filename in STAGE_FILES.items():
+        handler = handlers.get(filename)
+        if handler is None:
+            handler = logging.FileHandler(os.path.join(LOG_DIR, filename), encoding='utf-8')
+            handler.setFormatter(formatter)
+            handler.addFilter(_StageFilter())
+            handlers[filename] = handler
+        handler.filters[0].stages.add(f'pipe.{stage}')
+    return list(handlers.values())
+
+def setup_logging():
+    """Configura una sola vez el logger 'pipe' con la cola y el hilo escritor."""
+    global _listener, _queue_handler, _file_handlers
+    with _lock:
+        if _listener is not None:
+            return
+        _file_handlers = _build_file_handlers()
+        log_queue = queue.SimpleQueue()
+        _queue_handler = _DeferredQueueHandler(log_queue)
+        _listener = QueueListener(log_queue, *_file_handlers)
+        _listener.start()
+
+        root = logging.getLogger('pipe')
+        root.addHandler(_queue_handler)
+        root.setLevel(logging.DEBUG)  # El filtrado real ocurre en el logger de cada etapa
+        root.propagate = False
+        atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    # Vacía la cola y detiene el hilo escritor (se llama al salir)
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+            for handler in _file_handlers:
+                handler.close()
+
+def setup_worker_logging(log_dir=None):
+    """
+    Configura el logging de un proceso hijo (p. ej. el pool de análisis de
+    extract_many, iniciado con spawn): se escribe directamente en los archivos
+    de `log_dir`, sin cola ni hilo escritor, porque esos procesos terminan sin
+    ejecutar atexit y se perderían los registros aún en la cola.
+    """
+    global LOG_DIR, _listener, _queue_handler, _file_handlers
+    setup_logging()
+    with _lock:
+        root = logging.getLogger('pipe')
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        if _queue_handler is not None:
+            root.removeHandler(_queue_handler)
+            _queue_handler = None
+        for handler in _file_handlers:
+            root.removeHandler(handler)
+            handler.close()
+        if log_dir is not None:
+            LOG_DIR = log_dir
+        _file_handlers = _build_file_handlers()
+        for handler in _file_handlers:
+            root.addHandler(handler)
+
+def get_logger(stage):
+    setup_logging()
+    logger = logging.getLogger(f'pipe.{stage}')
+    logger.setLevel(_stage_level(stage))
+    return logger
+
+def row_detail_enabled(logger):
+    # Indica si conviene registrar filas individuales (se consulta una vez por tabla)
+    return ROW_SAMPLE_RATE > 0 and logger.isEnabledFor(logging.DEBUG)
+
+def sample_row():
+    return ROW_SAMPLE_RATE >= 1 or random.random() < ROW_SAMPLE_RATE
@@ -1,55 +1,211 @@
-import logging
-from extract import extract_data
-from transform import transform_data
-from load import save_to_csv, save_to_postgresql_combustibles, save_to_postgresql_resumen_anual
-from config import get_db_config
-
-# Configuración básica de logging
-logging.basicConfig(
-    filename='Logs/main_log.txt',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    encoding='utf-8'
-)
-
-def main():
-    # URL desde la cual se extraerán los datos
-    url = 'https://creg.gov.co/publicaciones/15565/precios-de-combustibles-liquidos/'  # URL real de ejemplo
+from logging_config import get_logger
+import argparse
+from contextlib import nullcontext
+from extract import extract_data, extract_many, iter_extract, mark_page_processed
+from transform import transform_data, transform_table
+from load import save_to_csv, save_to_postgresql_combustibles, save_to_postgresql_resumen_anual, db_transaction, StreamingSink, close_connection_pools
+from config import get_db_config, db_configured
+from manifest import load_manifest, save_manifest, select_changed_tables, check_table, build_entries, summarize_years
+from metrics import stage, run_instrumented, METRICS_FILE
+
+# Logging asíncrono y por etapa (ver logging_config.py)
+logger = get_logger('main')
+
+# URL desde la cual se extraerán los datos
+CREG_URL = 'https://creg.gov.co/publicaciones/15565/precios-de-combustibles-liquidos/'  # URL real de ejemplo
+
+def main(urls=None):
+    # Las conexiones del pool se cierran al terminar, también si el ETL termina antes o falla
+    try:
+        return _run_etl(urls)
+    finally:
+        close_connection_pools()
+
+def _run_etl(urls=None):
+    urls = urls or [CREG_URL]
     
     # Paso 1: Extracción de datos
-    logging.info("Iniciando el proceso de extracción de datos.")
-    raw_data = extract_data(url)
+    logger.info("Iniciando el proceso de extracción de datos.")
+    if len(urls) == 1:
+        raw_data = extract_data(urls[0], only_if_changed=True)
+    else:
+        # Varias páginas (backfill o espejos): descarga concurrente y tablas sin fechas repetidas
+        raw_data = extract_many(urls)
     
     if raw_data is None:
-        logging.error("No se pudieron extraer los datos.")
+        logger.error("No se pudieron extraer los datos.")
+        return
+
+    if not raw_data:
+        logger.info("No hay datos nuevos publicados; no se ejecutan la transformación ni la carga.")
         return
     
-    logging.info("Datos extraídos correctamente.")
+    logger.info("Datos extraídos correctamente.")
+
+    # Solo continúan las tablas de vigencia nuevas o modificadas desde la última carga
+    with stage('manifest') as s:
+        manifest = load_manifest()
+        raw_data, pending = select_changed_tables(raw_data, manifest)
+        s['tables'] = len(raw_data)
+
+    if not raw_data:
+        logger.info("Todas las tablas publicadas ya fueron cargadas anteriormente.")
+        for url in urls:
+            mark_page_processed(url)
+        return
     
     # Paso 2: Transformación de los datos
-    logging.info("Iniciando el proceso de transformación de datos.")
-    transformed_data, year_data = transform_data(raw_data)
+    logger.info("Iniciando el proceso de transformación de datos.")
+    with stage('transform') as s:
+        transformed_data, _ = transform_data(raw_data)
+        if transformed_data is not None:
+            s['tables'] = len(transformed_data)
+            s['rows'] = sum(len(table['data']) for table in transformed_data.values())
     
     if transformed_data is None:
-        logging.error("No se pudieron transformar los datos.")
+        logger.error("No se pudieron transformar los datos.")
         return
     
-    logging.info("Datos transformados correctamente.")
+    # El resumen anual se calcula con los resúmenes guardados de todas las tablas,
+    # no solo con las que se procesaron en esta ejecución
+    with stage('summary') as s:
+        new_entries = build_entries(pending)
+        year_data = summarize_years({**manifest, **new_entries})
+        s['rows'] = len(year_data)
+
+    logger.info("Datos transformados correctamente.")
     
     # Paso 3: Guardar los datos en archivos CSV
-    logging.info("Guardando los datos transformados y el resumen anual en archivos CSV.")
-    save_to_csv(transformed_data, year_data)  # Asegúrate de pasar year_data aquí
+    logger.info("Guardando los datos transformados y el resumen anual en archivos CSV.")
+    with stage('csv') as s:
+        csv_saved = save_to_csv(transformed_data, year_data)  # Asegúrate de pasar year_data aquí
+        s['tables'] = len(transformed_data)
+        s['rows'] = sum(len(table['data']) for table in transformed_data.values())
     
     # Paso 4: Cargar los datos en la base de datos
     config = get_db_config()  # Obtén la configuración de la base de datos
     
-    logging.info("Cargando los datos transformados en la base de datos.")
-    save_to_postgresql_combustibles(transformed_data, config)
-    
-    logging.info("Cargando el resumen anual en la base de datos.")
-    save_to_postgresql_resumen_anual(year_data, config)  # Asegúrate de pasar year_data aquí
+    # Ambas tablas se escriben con una conexión del pool y en una sola transacción:
+    # si alguna carga falla, no queda nada a medias en la base de datos.
+    # Sin base de datos configurada la etapa se omite y el manifiesto avanza igual;
+    # solo una base configurada que falla impide registrar las tablas como cargadas.
+    if not db_configured(config):
+        logger.info("No hay base de datos configurada (DB_HOST/DB_NAME); se omite la carga en PostgreSQL.")
+    else:
+        try:
+            # 'db' incluye ambas inserciones y el commit de la transacción
+            with stage('db'), db_transaction(config) as conn:
+                logger.info("Cargando los datos transformados en la base de datos.")
+                with stage('db_combustibles') as s:
+                    save_to_postgresql_combustibles(transformed_data, config, conn=conn)
+                    s['rows'] = sum(len(table['data']) for table in transformed_data.values())
+            
+                logger.info("Cargando el resumen anual en la base de datos.")
+                with stage('db_resumen_anual') as s:
+                    save_to_postgresql_resumen_anual(year_data, config, conn=conn)  # Asegúrate de pasar year_data aquí
+                    s['rows'] = len(year_data)
+        except Exception as e:
+            logger.error("Carga en la base de datos revertida: %s", e)
+            return
     
-    logging.info("Proceso ETL completado exitosamente.")
+    if not csv_saved:
+        logger.error("No se pudieron guardar los archivos CSV; las tablas se volverán a procesar en la próxima ejecución.")
+        return
+
+    # Registrar las tablas y la página como procesadas solo cuando la carga terminó sin errores
+    with stage('manifest_save'):
+        manifest.update(new_entries)
+        save_manifest(manifest)
+        for url in urls:
+            mark_page_processed(url)
+
+    logger.info("Proceso ETL completado exitosamente.")
+
+def main_streaming():
+    """
+    ETL en flujo: cada tabla extraída se transforma y se escribe (CSV y, si
+    está configurado, PostgreSQL) antes de leer la siguiente, por lo que las
+    filas en memoria no crecen con la cantidad de tablas. El resumen anual se
+    arma al final con los resúmenes por tabla del manifiesto, sin conservar
+    las filas.
+    """
+    try:
+        return _run_streaming()
+    finally:
+        close_connection_pools()
+
+def _run_streaming():
+    url = CREG_URL
+    config = get_db_config()
+    manifest = load_manifest()
+    new_entries = {}
+
+    logger.info("Iniciando el ETL en flujo.")
+    # Igual que en main(): sin base de datos configurada solo se escriben los archivos
+    use_db = db_configured(config)
+    if not use_db:
+        logger.info("No hay base de datos configurada (DB_HOST/DB_NAME); se omite la carga en PostgreSQL.")
+    try:
+        with (db_transaction(config) if use_db else nullcontext()) as conn:
+            sink = StreamingSink(conn=conn)
+
+            for table_data in iter_extract(url, only_if_changed=True):
+                # Solo continúan las tablas nuevas o modificadas desde la última carga
+                vigencia = table_data['date']
+                pending = check_table(table_data, manifest)
+                if pending is None:
+                    continue
+
+                with stage('transform') as s:
+                    table = transform_table(table_data)
+                    if table is not None:
+                        s['tables'], s['rows'] = 1, len(table['data'])
+                if table is None:
+                    continue
+
+                # El resumen valida los precios: se calcula antes de escribir para que una
+                # tabla con datos inválidos no deje su CSV a medias en disco
+                with stage('summary'):
+                    entries = build_entries({vigencia: pending})
+
+                # CSV, almacén columnar (por lotes) y PostgreSQL de la tabla
+                with stage('write') as s:
+                    sink.write(table)
+                    s['tables'], s['rows'] = 1, len(table['data'])
+                new_entries.update(entries)
+
+            if new_entries:
+                with stage('close') as s:
+                    year_data = summarize_years({**manifest, **new_entries})
+                    sink.close(year_data)
+                    s['rows'] = len(year_data)
+    except Exception as e:
+        logger.error("ETL en flujo interrumpido%s: %s", ", carga en la base de datos revertida" if use_db else "", e)
+        return
+
+    if not new_entries:
+        logger.info("No hay tablas nuevas o modificadas para cargar.")
+
+    # Registrar las tablas y la página como procesadas solo cuando la carga terminó sin errores
+    manifest.update(new_entries)
+    save_manifest(manifest)
+    mark_page_processed(url)
+
+    logger.info("Proceso ETL en flujo completado exitosamente.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="ETL de precios de combustibles de la CREG")
+    parser.add_argument('--stream', action='store_true', help="Procesar y cargar las tablas una a una (memoria constante)")
+    parser.add_argument('--url', action='append', dest='urls',
+                        help="Página a extraer; se puede repetir para backfills o espejos (no aplica a --stream)")
+    parser.add_argument('--metrics', default=METRICS_FILE,
+                        help="Archivo de métricas por etapa: .prom para Prometheus (textfile), otro para JSON por línea")
+    parser.add_argument('--profile', action='store_true', help="Agregar a las métricas las funciones más costosas (cProfile)")
+    parser.add_argument('--trace-memory', action='store_true', help="Agregar a las métricas el pico y las mayores asignaciones de memoria (tracemalloc)")
+    args = parser.parse_args()
+
+    options = dict(metrics_path=args.metrics, profile=args.profile, trace_memory=args.trace_memory)
+    if args.stream:
+        run_instrumented('etl_stream', main_streaming, **options)
+    else:
+        run_instrumented('etl', main, args.urls, **options)
\ No newline at end of file
@@ -0,0 +1,72 @@
+import os
+import json
+import hashlib
+from transform import summarize_tables, build_year_data
+from logging_config import get_logger
+
+logger = get_logger('manifest')
+
+# Manifiesto de tablas ya cargadas: {fecha de vigencia (YYYY-MM-DD): {hash, year, summary}}
+MANIFEST_FILE = 'Cache/manifest.json'
+
+# Hash de las filas de una tabla extraída (encabezados y datos)
+def table_hash(table):
+    payload = json.dumps([table['headers'], table['data']], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def load_manifest(path=MANIFEST_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+# Guardar el manifiesto de forma atómica
+def save_manifest(manifest, path=MANIFEST_FILE):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+# Devuelve la entrada pendiente {hash, data} si la tabla es nueva o cambió, o None si ya se cargó
+def check_table(table, manifest):
+    digest = table_hash(table)
+    entry = manifest.get(table['date'])
+    if entry is not None and entry['hash'] == digest:
+        return None
+    return {'hash': digest, 'data': table['data']}
+
+def select_changed_tables(raw_data, manifest):
+    """
+    Devuelve (tablas nuevas o modificadas, pendientes), donde `pendientes`
+    guarda el hash y las filas de cada una por fecha de vigencia, para
+    registrarlas en el manifiesto una vez que la carga termine.
+    """
+    changed = []
+    pending = {}
+    for table in raw_data:
+        entry = check_table(table, manifest)
+        if entry is None:
+            continue
+        changed.append(table)
+        pending[table['date']] = entry
+
+    logger.info("Tablas nuevas o modificadas: %d de %d", len(changed), len(raw_data))
+    return changed, pending
+
+# Convertir las tablas pendientes en entradas del manifiesto (con su resumen de precios)
+def build_entries(pending):
+    summaries = summarize_tables({date: table['data'] for date, table in pending.items()})
+    return {
+        date: {
+            'hash': table['hash'],
+            'year': date.split('-')[0],
+            'summary': summaries[date]
+        }
+        for date, table in pending.items()
+    }
+
+# Resumen anual de todas las tablas registradas, sin volver a procesar sus filas
+def summarize_years(manifest):
+    dates = sorted(manifest, reverse=True)
+    return build_year_data((manifest[date]['year'], manifest[date]['summary']) for date in dates)
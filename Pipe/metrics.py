@@ -0,0 +1,177 @@
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Métricas por ejecución del ETL: tiempo, llamadas, filas, tablas y bytes de cada etapa.
+# Las etapas se registran con `with stage('nombre') as s: ...; s['rows'] += n`; si no hay
+# una ejecución activa (start_run), stage() no mide nada y casi no tiene costo.
+
+METRICS_FILE = 'Logs/metrics.jsonl'
+COUNTERS = ('rows', 'tables', 'bytes')
+
+_current = None
+_lock = threading.Lock()
+
+class RunMetrics:
+    def __init__(self, name):
+        self.name = name
+        self.started_at = datetime.now(timezone.utc).isoformat()
+        self.stages = {}
+        self.extra = {}
+        self._start = time.perf_counter()
+        self.seconds = None
+
+    def add(self, name, seconds, **counters):
+        with _lock:
+            entry = self.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, **{c: 0 for c in COUNTERS}})
+            entry['seconds'] += seconds
+            entry['calls'] += 1
+            for counter, value in counters.items():
+                entry[counter] += value
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self._start
+        try:
+            import resource
+            # ru_maxrss está en KB en Linux
+            self.extra['peak_rss_bytes'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except ImportError:
+            pass
+
+    def to_dict(self):
+        return {
+            'run': self.name,
+            'started_at': self.started_at,
+            'seconds': self.seconds,
+            'stages': self.stages,
+            **self.extra
+        }
+
+def start_run(name):
+    global _current
+    _current = RunMetrics(name)
+    return _current
+
+def end_run():
+    global _current
+    run, _current = _current, None
+    if run is not None:
+        run.finish()
+    return run
+
+@contextmanager
+def stage(name):
+    """Mide el bloque como la etapa `name`; los contadores se acumulan en el dict entregado."""
+    run = _current
+    counters = {c: 0 for c in COUNTERS}
+    if run is None:
+        yield counters
+        return
+    start = time.perf_counter()
+    try:
+        yield counters
+    finally:
+        run.add(name, time.perf_counter() - start, **counters)
+
+def count(name, seconds=0.0, **counters):
+    # Registra una etapa medida por fuera de stage() (p. ej. tiempos acumulados en un bucle)
+    if _current is not None:
+        _current.add(name, seconds, **counters)
+
+def merge_stages(stages):
+    # Suma a la ejecución activa las etapas medidas en otro proceso (p. ej. el pool de análisis)
+    if _current is None:
+        return
+    with _lock:
+        for name, other in stages.items():
+            entry = _current.stages.setdefault(name, {'seconds': 0.0, 'calls': 0, **{c: 0 for c in COUNTERS}})
+            for key, value in other.items():
+                entry[key] = entry.get(key, 0) + value
+
+def to_prometheus(run):
+    lines = []
+    metrics = [('seconds', 'Duración de la etapa en segundos'), ('calls', 'Veces que se ejecutó la etapa')]
+    metrics += [(c, f'Cantidad de {c} procesados por la etapa') for c in COUNTERS]
+    for metric, help_text in metrics:
+        lines.append(f'# HELP etl_stage_{metric} {help_text}')
+        lines.append(f'# TYPE etl_stage_{metric} gauge')
+        for name, entry in run.stages.items():
+            lines.append(f'etl_stage_{metric}{{run="{run.name}",stage="{name}"}} {entry[metric]}')
+    lines.append('# TYPE etl_run_seconds gauge')
+    lines.append(f'etl_run_seconds{{run="{run.name}"}} {run.seconds}')
+    for key in ('peak_rss_bytes', 'tracemalloc_peak_bytes'):
+        if key in run.extra:
+            lines.append(f'# TYPE etl_{key} gauge')
+            lines.append(f'etl_{key}{{run="{run.name}"}} {run.extra[key]}')
+    return '\n'.join(lines) + '\n'
+
+def write_metrics(run, path=METRICS_FILE):
+    """
+    Guarda las métricas de la ejecución. Con extensión .prom se escribe (de
+    forma atómica) un archivo de texto para el textfile collector de
+    Prometheus; en otro caso se agrega una línea JSON por ejecución, para
+    comparar ejecuciones y detectar regresiones.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    if path.endswith('.prom'):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(to_prometheus(run))
+        os.replace(tmp_path, path)
+    else:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(run.to_dict(), ensure_ascii=False) + '\n')
+
+def _top_functions(profiler, limit):
+    stats = pstats.Stats(profiler, stream=io.StringIO()).sort_stats('cumulative')
+    top = []
+    for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+        top.append({
+            'function': f"{os.path.basename(filename)}:{line}({function})",
+            'calls': calls,
+            'own_seconds': round(own, 6),
+            'cumulative_seconds': round(cumulative, 6)
+        })
+    top.sort(key=lambda item: item['cumulative_seconds'], reverse=True)
+    return top[:limit]
+
+def run_instrumented(name, func, *args, metrics_path=METRICS_FILE, profile=False, trace_memory=False, top=20, **kwargs):
+    """
+    Ejecuta func(*args, **kwargs) como una ejecución medida y guarda sus
+    métricas. Con `profile` agrega las funciones con mayor tiempo acumulado
+    (cProfile); con `trace_memory`, el pico de memoria y las líneas que más
+    memoria asignaron (tracemalloc). Ambos modos agregan sobrecosto.
+    """
+    run = start_run(name)
+    profiler = cProfile.Profile() if profile else None
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        if profiler is not None:
+            profiler.enable()
+        return func(*args, **kwargs)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        if trace_memory:
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+                tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>')
+            ])
+            run.extra['tracemalloc_peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            run.extra['allocations'] = [
+                {'line': str(stat.traceback[0]), 'bytes': stat.size, 'count': stat.count}
+                for stat in snapshot.statistics('lineno')[:top]
+            ]
+        if profiler is not None:
+            run.extra['hotspots'] = _top_functions(profiler, top)
+        end_run()
+        write_metrics(run, metrics_path)
@@ -1,15 +1,11 @@
 from datetime import datetime
-import logging
-from collections import defaultdict
+from logging_config import get_logger
+import numpy as np
+import pandas as pd
 from extract import extract_data
 
-# Configuración de logging en UTF-8 y en español
-logging.basicConfig(
-    filename='Logs/transform_log.txt',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    encoding='utf-8'
-)
+# Logging asíncrono y por etapa (ver logging_config.py)
+logger = get_logger('transform')
 
 def convert_date(date_str: str):
     # Separar la fecha en partes
@@ -27,92 +23,151 @@ def convert_date(date_str: str):
     formatted_date = f"{day}-{month}-{year}"
     return formatted_date
 
+PRICE_COLUMNS = ['gasolina', 'acpm']
+
+# Resumen vacío (conteo, máximo, mínimo y suma de cada combustible)
+def empty_summary():
+    return {
+        'count': 0,
+        'gasolina_max': None, 'gasolina_min': None, 'gasolina_sum': 0.0,
+        'acpm_max': None, 'acpm_min': None, 'acpm_sum': 0.0
+    }
+
+# Construir un único DataFrame tipado (key, gasolina, acpm) con las filas de todas las tablas.
+# Recibe pares (clave, filas); las filas con menos de 4 columnas se omiten.
+def build_price_frame(keyed_rows):
+    keys = []
+    all_rows = []
+    for key, rows in keyed_rows:
+        keys.extend([key] * len(rows))
+        all_rows.extend(rows)
+
+    table = pd.DataFrame(all_rows)
+    if table.shape[1] < 4:
+        table = table.reindex(columns=range(4))
+    valid = table[3].notna().to_numpy()
+
+    incomplete = len(valid) - int(valid.sum())
+    if incomplete:
+        logger.warning("Filas con datos incompletos omitidas: %d", incomplete)
+
+    prices = pd.DataFrame({
+        'key': np.asarray(keys, dtype=object)[valid],
+        'gasolina': table[2].to_numpy()[valid],
+        'acpm': table[3].to_numpy()[valid]
+    })
+    # Conversión única de los precios (mismas reglas que float(); un valor inválido lanza ValueError)
+    prices[PRICE_COLUMNS] = prices[PRICE_COLUMNS].astype(float)
+    return prices
+
+# Resumen (conteo, máximo, mínimo y suma) por clave, con una sola agrupación
+def summarize_prices(prices):
+    grouped = prices.groupby('key', sort=False).agg(
+        count=('gasolina', 'size'),
+        gasolina_max=('gasolina', 'max'), gasolina_min=('gasolina', 'min'), gasolina_sum=('gasolina', 'sum'),
+        acpm_max=('acpm', 'max'), acpm_min=('acpm', 'min'), acpm_sum=('acpm', 'sum')
+    )
+    return grouped.to_dict('index')
+
+# Resumen de cada tabla de un diccionario {clave: filas}
+def summarize_tables(tables):
+    summaries = summarize_prices(build_price_frame(tables.items()))
+    return {key: summaries.get(key, empty_summary()) for key in tables}
+
+# Acumular un resumen dentro de otro (ambos con el formato de empty_summary)
+def merge_summary(total, summary):
+    if summary['count'] == 0:
+        return total
+    for fuel in PRICE_COLUMNS:
+        if total['count'] == 0:
+            total[f'{fuel}_max'] = summary[f'{fuel}_max']
+            total[f'{fuel}_min'] = summary[f'{fuel}_min']
+        else:
+            total[f'{fuel}_max'] = max(total[f'{fuel}_max'], summary[f'{fuel}_max'])
+            total[f'{fuel}_min'] = min(total[f'{fuel}_min'], summary[f'{fuel}_min'])
+        total[f'{fuel}_sum'] += summary[f'{fuel}_sum']
+    total['count'] += summary['count']
+    return total
+
+# Construir el resumen anual a partir de pares (año, resumen), en orden de aparición
+def build_year_data(year_summaries):
+    totals = {}
+    for year, summary in year_summaries:
+        if summary['count'] == 0:
+            continue
+        if year not in totals:
+            totals[year] = empty_summary()
+        merge_summary(totals[year], summary)
+
+    year_data = []
+    for year, values in totals.items():
+        year_data.append({
+            'year': year,
+            'gasolina_max': values['gasolina_max'],
+            'gasolina_min': values['gasolina_min'],
+            'gasolina_avg': values['gasolina_sum'] / values['count'],
+            'acpm_max': values['acpm_max'],
+            'acpm_min': values['acpm_min'],
+            'acpm_avg': values['acpm_sum'] / values['count']
+        })
+    return year_data
+
+# Transformar una sola tabla extraída; devuelve None si su fecha no es válida
+def transform_table(table_data):
+    # Limpiar la fecha
+    date_str = table_data['date'].replace('\xa0', ' ')
+
+    # Convertir la fecha al formato de base de datos (DD-MM-YYYY)
+    try:
+        formatted_date = convert_date(date_str)
+        table_data['date'] = formatted_date  # Actualizar la fecha transformada
+        logger.debug("Fecha transformada: %s", formatted_date)
+    except ValueError as e:
+        logger.error("Error al transformar la fecha: %s con el error: %s", date_str, e)
+        return None
+
+    return {
+        'date': formatted_date,  # Asegúrate de que la fecha esté aquí
+        'headers': table_data['headers'],
+        'data': table_data['data']
+    }
+
 def transform_data(raw_data):
-    logging.info(f"Datos obtenidos: {raw_data}")
+    logger.info("Tablas recibidas para transformar: %d", len(raw_data))
     try:
         transformed_data = {}  # Diccionario en lugar de lista
-        year_summary = defaultdict(lambda: {
-            'gasolina_max': float('-inf'),
-            'gasolina_min': float('inf'),
-            'gasolina_avg': 0,
-            'acpm_max': float('-inf'),
-            'acpm_min': float('inf'),
-            'acpm_avg': 0,
-            'count': 0
-        })
+        year_rows = []  # Pares (año, filas) de todas las tablas
         
         for table_data in raw_data:
-            # Limpiar la fecha
-            date_str = table_data['date'].replace('\xa0', ' ')
-            logging.info(f"Fecha limpia: {date_str}")
-            
-            # Convertir la fecha al formato de base de datos (DD-MM-YYYY)
-            try:
-                formatted_date = convert_date(date_str)
-                table_data['date'] = formatted_date  # Actualizar la fecha transformada
-                logging.info(f"Fecha transformada: {formatted_date}")
-            except ValueError as e:
-                logging.error(f"Error al transformar la fecha: {date_str} con el error: {e}")
+            table = transform_table(table_data)
+            if table is None:
                 continue
 
-            # Procesar las filas de datos
-            for row in table_data['data']:
-                try:
-                    if len(row) >= 4:
-                        gasolina_mc = row[2]
-                        acpm = row[3]
-                        year = formatted_date.split('-')[2]
-
-                        # Actualizar los valores resumen
-                        year_summary[year]['gasolina_max'] = max(year_summary[year]['gasolina_max'], float(gasolina_mc))
-                        year_summary[year]['gasolina_min'] = min(year_summary[year]['gasolina_min'], float(gasolina_mc))
-                        year_summary[year]['acpm_max'] = max(year_summary[year]['acpm_max'], float(acpm))
-                        year_summary[year]['acpm_min'] = min(year_summary[year]['acpm_min'], float(acpm))
-                        year_summary[year]['gasolina_avg'] += float(gasolina_mc)
-                        year_summary[year]['acpm_avg'] += float(acpm)
-                        year_summary[year]['count'] += 1
-                    else:
-                        logging.warning(f"Fila con datos incompletos: {row}. Se omite esta fila.")
-                        continue
-
-                except IndexError as e:
-                    logging.error(f"Error al acceder a los datos de la fila: {row}, con el error: {e}")
-                    continue
+            formatted_date = table['date']
+            year_rows.append((formatted_date.split('-')[2], table['data']))
 
             # Agregar la fecha a los datos transformados
-            transformed_data[formatted_date] = {
-                'date': formatted_date,  # Asegúrate de que la fecha esté aquí
-                'headers': table_data['headers'],
-                'data': table_data['data']
-            }
-
-        # Calcular promedios
-        for year, values in year_summary.items():
-            if values['count'] > 0:
-                values['gasolina_avg'] /= values['count']
-                values['acpm_avg'] /= values['count']
-            else:
-                values['gasolina_avg'] = 0
-                values['acpm_avg'] = 0
+            transformed_data[formatted_date] = table
+
+        # Un solo DataFrame con los precios de todas las tablas y una sola agrupación por año
+        prices = build_price_frame(year_rows)
+        year_summary = prices.groupby('key', sort=False).agg(
+            gasolina_max=('gasolina', 'max'),
+            gasolina_min=('gasolina', 'min'),
+            gasolina_avg=('gasolina', 'mean'),
+            acpm_max=('acpm', 'max'),
+            acpm_min=('acpm', 'min'),
+            acpm_avg=('acpm', 'mean')
+        )
 
         # Crear un resumen por año
-        year_data = []
-        for year, values in year_summary.items():
-            year_data.append({
-                'year': year,
-                'gasolina_max': values['gasolina_max'],
-                'gasolina_min': values['gasolina_min'],
-                'gasolina_avg': values['gasolina_avg'],
-                'acpm_max': values['acpm_max'],
-                'acpm_min': values['acpm_min'],
-                'acpm_avg': values['acpm_avg']
-            })
-
-        logging.info("Transformación de datos completada exitosamente.")
+        year_data = year_summary.rename_axis('year').reset_index().to_dict('records')
+
+        logger.info("Transformación de datos completada exitosamente.")
         return transformed_data, year_data  # Devuelve el diccionario y la lista de resumen
     
     except Exception as e:
-        logging.error(f"Error en la transformación de datos: {str(e)}")
+        logger.error("Error en la transformación de datos: %s", e)
         return None, None
 
 if __name__ == "__main__":
@@ -123,11 +178,11 @@ if __name__ == "__main__":
     transformed_data, year_data = transform_data(raw_data)
     
     if transformed_data is not None and year_data is not None:
-        logging.info(f"Primeros datos transformados: {transformed_data}")
-        logging.info(f"Resumen por año: {year_data}")
+        logger.debug("Primeros datos transformados: %s", transformed_data)
+        logger.debug("Resumen por año: %s", year_data)
         print("Datos transformados:")
         print(transformed_data)  # Muestra los datos transformados
         print("Resumen por año:")
         print(year_data)  # Muestra el resumen por año
     else:
-        logging.error("No se pudieron transformar los datos.")
+        logger.error("No se pudieron transformar los datos.")